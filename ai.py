@@ -1,7 +1,17 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from generate_plot import generate_plot
+import numpy as np
+import os
+from generate_plot import generate_plot, generate_band_plot, generate_payback_histogram, generate_tornado_plot, generate_heatmap, generate_pareto_plot, generate_cost_breakdown_plot, generate_comparison_plot
+from cache import SharedCache, canonical_key
+from model import DEFAULT_FLEET_INPUTS, DEFAULT_INPUTS, DEFAULT_OPERATIONAL_YEARS, FLEET_TYPES
+from montecarlo import DISTRIBUTION_KINDS, UNCERTAIN_INPUTS, simulate, spread_distribution
+from profiling import fragment_profiler, start_rerun
+from optimizer import OBJECTIVES, optimize_fleet
+from projection import COST_CATEGORIES, PERIODS_PER_YEAR, compare_fleet_types, compare_projections
+from sensitivity import METRICS, SCENARIOS, cell_size, grid_frame, grid_sweep, sweep_values, tornado
+from store import DEFAULT_STORE, ScenarioStore
 
 # Page Setup
 st.set_page_config(
@@ -12,7 +22,11 @@ st.set_page_config(
 alt.themes.enable("dark")
 # --------------
 
-tab1, tab2 = st.tabs(["Metrics", "Other"])
+# Rerun profiling: always on with COULOMB_PROFILE=1, or per session from the sidebar
+show_profile = st.sidebar.toggle("Show rerun profile", value=False)
+profiler = start_rerun(enabled=True if show_profile else None)
+
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["Metrics", "Sensitivity", "Optimizer", "Compare", "Other"])
 
 ################## Notes #####################
 
@@ -25,28 +39,25 @@ if "currency" not in st.session_state:
     st.session_state.currency = "₹"
 if "inputs" not in st.session_state:
     # Default values
-    st.session_state.inputs = {
-        "coulomb_partner_cost": 1800,
-        "vaqui_cost_ev2w": 80 * 1000,
-        "vaqui_cost_ev3w": 350 * 1000,
-        "gov_subsidy_ev2w": 15 * 1000,
-        "gov_subsidy_ev3w": 40 * 1000,
-        "state_incentive_ev2w": 0 * 1000,
-        "state_incentive_ev3w": 0 * 1000,
-        "contract_cost_ev2w": 1 * 1000,
-        "contract_cost_ev3w": 4 * 1000,
-        "platform_operational_cost": 0 * 1000,
-        "vehicle_inspection_cost": 0 * 1000,
-        "basic_insurance_2w": 5 * 1000,
-        "basic_insurance_3w": 15 * 1000,
-        "annual_maintenance_cost": 5 * 1000,
-        "battery_replacement_cost_2w": 0 * 1000,
-        "battery_replacement_cost_3w": 0 * 1000,
-        "electricity_cost_per_km": 0.90,
-        "rev_km": 30.0,
-        "driver_wage_2w": 87.0,
-        "driver_wage_3w": 100.0
-    }
+    st.session_state.inputs = dict(DEFAULT_INPUTS)
+# Fleet, work and downtime values, and the projection settings, kept so a saved scenario can be loaded back
+if "fleet_inputs" not in st.session_state:
+    st.session_state.fleet_inputs = dict(DEFAULT_FLEET_INPUTS)
+    st.session_state.fleet_type = FLEET_TYPES[0]
+    st.session_state.operational_years = DEFAULT_OPERATIONAL_YEARS
+    # Cost escalation as entered, in percent
+    st.session_state.escalation_inputs = {"period_length": "Yearly", "wage_inflation": 0.0, "electricity_inflation": 0.0,
+                                          "battery_fade": 0.0, "downtime_ramp": 0.0, "discount_rate": 0.0}
+# Projections and chart specs shared by every session of the server, so users pricing the same
+# scenario reuse one result. COULOMB_CACHE_MB caps its memory, COULOMB_CACHE_TTL (seconds) the entry age.
+@st.cache_resource
+def get_shared_cache():
+    return SharedCache(max_bytes=int(float(os.environ.get("COULOMB_CACHE_MB", 256)) * 1024 * 1024),
+                       ttl=float(os.environ.get("COULOMB_CACHE_TTL", 3600)))
+
+shared_cache = get_shared_cache()
+# Hits and misses of every session during this rerun
+profiler.watch_cache("shared_cache", shared_cache)
 
 # Function to convert values between currencies
 def convert_currency(value, from_currency, to_currency):
@@ -57,264 +68,418 @@ def convert_currency(value, from_currency, to_currency):
     if from_currency == "$" and to_currency == "₹":
         return value * conversion_rate
 
-# Function to calculate annual revenue
-def get_annual_revenue(battery_issues, software_issues, num_vans_2w, num_vans_3w,
-                        rev_km, work_days, daily_average_km_2w, daily_average_km_3w):
-    missed_km_percentage = (battery_issues + software_issues) / 100 # Lost Revenue
-    daily_km_2w = daily_average_km_2w * num_vans_2w
-    daily_km_3w = daily_average_km_3w * num_vans_3w # Daily Revenue
-    annual_revenue = (
-        (daily_km_2w + daily_km_3w) * (1 - missed_km_percentage) * work_days * rev_km
-    )
-    return annual_revenue
-
-# Function to calculate annual cost
-def get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
-                    work_hours, work_days, annual_maintenance_cost, battery_replacement_cost_2w, battery_replacement_cost_3w,
-                    driver_wage_2w, driver_wage_3w, battery_issues, software_issues, annual_revenue, amortization_cost,
-                    basic_insurance_2w, basic_insurance_3w):
-    annual_electricity = (daily_average_km_2w * num_vans_2w + daily_average_km_3w * num_vans_3w) * electricity_cost_per_km * work_days
-    annual_maintenance = annual_maintenance_cost * (num_vans_2w + num_vans_3w)
-    annual_battery = battery_replacement_cost_2w * num_vans_2w + battery_replacement_cost_3w * num_vans_3w
-    annual_driver = (driver_wage_2w * num_vans_2w + driver_wage_3w * num_vans_3w) * work_hours * work_days
-    annual_downtime = (battery_issues + software_issues) / 100 * annual_revenue
-    annual_insurance = (basic_insurance_2w * num_vans_2w + basic_insurance_3w * num_vans_3w)
-    annual_costs = annual_electricity + annual_maintenance + annual_battery + annual_driver + annual_downtime + amortization_cost + annual_insurance
-    return annual_costs
+# Function to express a scenario's amounts in ₹, so the same scenario entered in any currency has one cache key
+def to_rupees(scenario, units):
+    return {**scenario, **{key: convert_currency(scenario[key], units, "₹") for key in DEFAULT_INPUTS}}
+
+# Function to convert the amount columns of a DataFrame priced in ₹
+def convert_columns(frame, columns, units):
+    return frame.assign(**{column: convert_currency(frame[column], "₹", units) for column in columns})
+
+# Function to run the Monte Carlo simulation, cached so display-only changes do not resample
+@st.cache_data(max_entries=16, show_spinner="Sampling scenarios...")
+def run_monte_carlo(scenario, distributions, operational_years, samples, escalation, seed=0):
+    return simulate(scenario, distributions, operational_years, samples, seed, **escalation)
+
+# Functions to run the sensitivity analysis, cached so colour scale and axis range changes reuse the results
+@st.cache_data(max_entries=16, show_spinner=False)
+def run_tornado(scenario, operational_years, metric, change, escalation):
+    return tornado(scenario, operational_years, metric, change=change, **escalation)
+
+@st.cache_data(max_entries=8, show_spinner="Sweeping scenarios...")
+def run_grid_sweep(scenario, operational_years, x_field, x_range, y_field, y_range, steps, metric, escalation):
+    return grid_sweep(scenario, operational_years,
+                      x_field, sweep_values(x_field, *x_range, steps),
+                      y_field, sweep_values(y_field, *y_range, steps), metric, **escalation)
+
+# Function to build the period-by-period projection and its DataFrames, without and with Coulomb
+def project_scenario(scenario, operational_years, escalation):
+    baseline, coulomb = compare_projections(scenario, operational_years, **escalation)
+    projection = {}
+    for name, result in (("baseline", baseline), ("coulomb", coulomb)):
+        payback_period = result["payback_period"][0]
+        projection[name] = {
+            "profits_data": pd.DataFrame({
+                "Year": result["years"],
+                "Revenue": result["revenues"][0],
+                "Cost": result["costs"][0],
+                "Cumulative Profit": result["profits"][0],
+            }),
+            "breakdown_data": pd.DataFrame({
+                "Year": result["years"][1:],
+                **{label: result["cost_breakdown"][key][0, 1:] for key, label in COST_CATEGORIES.items() if key != "initial"},
+            }),
+            "payback_period": None if np.isnan(payback_period) else float(payback_period),
+            "total_cost": result["total_cost"][0],
+            "roi": result["roi"][0],
+            "npv": result["npv"][0],
+            "fleet_utilization": result["fleet_utilization"][0],
+        }
+    profiler.count("dataframes", 4)
+    return projection
+
+# Function to convert a projection priced in ₹ to another currency. The model is linear in every
+# amount, so this gives the same figures as pricing in that currency; ROI, payback and utilization do not change.
+def projection_in_currency(projection, units):
+    converted = {}
+    for name, result in projection.items():
+        converted[name] = {
+            **result,
+            "profits_data": convert_columns(result["profits_data"], ["Revenue", "Cost", "Cumulative Profit"], units),
+            "breakdown_data": convert_columns(result["breakdown_data"], [column for column in result["breakdown_data"] if column != "Year"], units),
+            "total_cost": convert_currency(result["total_cost"], "₹", units),
+            "npv": convert_currency(result["npv"], "₹", units),
+        }
+    profiler.count("dataframes", 4)
+    return converted
+
+# Function to project the scenario as every fleet type and build the summary table and chart data
+def compare_fleets(scenario, operational_years, escalation):
+    baseline, coulomb = compare_fleet_types(scenario, operational_years, **escalation)
+    summary = []
+    chart_data = []
+    for index, fleet in enumerate(FLEET_TYPES):
+        for label, result in (("Without Coulomb", baseline), ("With Coulomb", coulomb)):
+            summary.append({
+                "Fleet Type": fleet,
+                "Scenario": label,
+                "ROI (%)": result["roi"][index],
+                "Payback Period (Years)": result["payback_period"][index],
+                "Fleet Utilization": result["fleet_utilization"][index],
+                "Cost Savings": baseline["total_cost"][index] - result["total_cost"][index],
+                "Final Cumulative Profit": result["final_profit"][index],
+                "Net Present Value": result["npv"][index],
+            })
+            chart_data.append(pd.DataFrame({
+                "Fleet Type": fleet,
+                "Scenario": label,
+                "Year": result["years"],
+                "Revenue": result["revenues"][index],
+                "Cost": result["costs"][index],
+                "Cumulative Profit": result["profits"][index],
+            }))
+    profiler.count("dataframes", len(chart_data) + 2)
+    return {"summary": pd.DataFrame(summary), "chart_data": pd.concat(chart_data, ignore_index=True)}
+
+# Function to convert a fleet comparison priced in ₹ to another currency
+def comparison_in_currency(comparison, units):
+    profiler.count("dataframes", 2)
+    return {
+        "summary": convert_columns(comparison["summary"], ["Cost Savings", "Final Cumulative Profit", "Net Present Value"], units),
+        "chart_data": convert_columns(comparison["chart_data"], ["Revenue", "Cost", "Cumulative Profit"], units),
+    }
+
+# Metrics panel; flipping the Coulomb toggle reruns only this panel
+@st.fragment
+@fragment_profiler("metrics_panel", enabled=True if show_profile else None)
+def metrics_panel(projection, simulation, units):
+    payback_period = projection["baseline"]["payback_period"]
+    coulomb_payback_period = projection["coulomb"]["payback_period"]
+
+    # Calculate cost savings
+    total_cost = projection["baseline"]["total_cost"]
+    coulomb_total_cost = projection["coulomb"]["total_cost"]
+
+    # Calculate ROI
+    roi = projection["baseline"]["roi"]
+    coulomb_roi = projection["coulomb"]["roi"]
+
+    # Net present value
+    npv = projection["baseline"]["npv"]
+    coulomb_npv = projection["coulomb"]["npv"]
+
+    # Fleet utilization
+    fleet_utilization = projection["baseline"]["fleet_utilization"]
+    coulomb_fleet_utilization = projection["coulomb"]["fleet_utilization"]
+
+    using_coulomb = st.toggle("Using Coulomb", value=True)
+    if simulation is not None:
+        roi_bands = simulation["coulomb" if using_coulomb else "baseline"]["roi_bands"]
+        st.metric(label="ROI Range (P10 - P90)", value=f"{roi_bands[0]:.2f}% - {roi_bands[2]:.2f}%")
+    # Display Metrics
+    if using_coulomb:
+        st.metric(label="Return on Investment (ROI)", value=f"{coulomb_roi:.2f}%", delta=f"{coulomb_roi - 100:.2f}%", delta_color="normal")
+        if coulomb_payback_period and payback_period:
+            st.metric(label="Payback Period (Years)", value=f"{coulomb_payback_period:.2f}", delta=f"{coulomb_payback_period - payback_period:.2f}", delta_color="inverse")
+        elif coulomb_payback_period:
+            st.metric(label="Payback Period (Years)", value=f"{coulomb_payback_period:.2f}")
+        else:
+            st.metric(label="Payback Period (Years)", value=f"Cannot with given years of operation")
+        st.metric(label="Fleet Utilization", value=f"{coulomb_fleet_utilization:,.2f}", delta=f"{coulomb_fleet_utilization - fleet_utilization:.2f}", delta_color="normal")
+        st.metric(label="Cost Savings", value=f"{units}{total_cost - coulomb_total_cost:,.2f}", delta=f"{total_cost - coulomb_total_cost:,.2f}", delta_color="normal")
+        st.metric(label="Net Present Value", value=f"{units}{coulomb_npv:,.2f}", delta=f"{coulomb_npv - npv:,.2f}", delta_color="normal")
+    else:
+        st.metric(label="Return on Investment (ROI)", value=f"{roi:.2f}%", delta=f"{roi - 100:.2f}%", delta_color="normal")
+        if coulomb_payback_period and payback_period:
+            st.metric(label="Payback Period (Years)", value=f"{payback_period:.2f}", delta=f"{payback_period - coulomb_payback_period:.2f}", delta_color="inverse")
+        elif payback_period:
+            st.metric(label="Payback Period (Years)", value=f"{payback_period:.2f}")
+        else:
+            st.metric(label="Payback Period (Years)", value=f"Cannot with given years of operation")
+        st.metric(label="Fleet Utilization", value=f"{fleet_utilization:,.2f}", delta=f"{fleet_utilization - coulomb_fleet_utilization:.2f}", delta_color="normal")
+        st.metric(label="Cost Savings", value=f"{units}0", delta=f"{coulomb_total_cost - total_cost:,.2f}", delta_color="normal")
+        st.metric(label="Net Present Value", value=f"{units}{npv:,.2f}", delta=f"{npv - coulomb_npv:,.2f}", delta_color="normal")
+
+# Operating cost breakdown chart, with its own scenario toggle so it also reruns on its own
+@st.fragment
+@fragment_profiler("cost_breakdown_chart", enabled=True if show_profile else None)
+def cost_breakdown_chart(projection, projection_key, units):
+    st.markdown("### Operating Cost Breakdown")
+    breakdown_scenario = "coulomb" if st.toggle("With Coulomb", value=True) else "baseline"
+    generate_cost_breakdown_plot(projection[breakdown_scenario]["breakdown_data"], units,
+                                 shared_cache, (projection_key, "breakdown", breakdown_scenario, units))
+
+# Function to open the scenario store once per server process
+@st.cache_resource
+def get_store():
+    return ScenarioStore(os.environ.get("COULOMB_STORE", DEFAULT_STORE))
+
+# Inputs whose widgets show thousands, and every input with a widget on the Metrics tab
+THOUSANDS_INPUTS = ("vaqui_cost_ev2w", "vaqui_cost_ev3w", "gov_subsidy_ev2w", "gov_subsidy_ev3w", "state_incentive_ev2w",
+                    "state_incentive_ev3w", "contract_cost_ev2w", "contract_cost_ev3w", "basic_insurance_2w", "basic_insurance_3w",
+                    "annual_maintenance_cost", "battery_replacement_cost_2w", "battery_replacement_cost_3w")
+WIDGET_INPUTS = THOUSANDS_INPUTS + ("electricity_cost_per_km", "rev_km", "driver_wage_2w", "driver_wage_3w")
+
+# Function to set the Metrics widgets to the stored values, in the units they show. The widgets are keyed,
+# so a loaded scenario or converted amounts only reach them through their session state keys.
+def set_input_widgets(amounts_only=False):
+    for key in WIDGET_INPUTS:
+        value = st.session_state.inputs[key]
+        st.session_state[f"input_{key}"] = float(value / 1000 if key in THOUSANDS_INPUTS else value)
+    if amounts_only:
+        return
+    for key, value in st.session_state.fleet_inputs.items():
+        st.session_state[f"input_{key}"] = round(value * 100 if key == "manager_ownership_factor" else value)
+    for key, value in st.session_state.escalation_inputs.items():
+        st.session_state[f"input_{key}"] = value if key == "period_length" else float(value)
+    st.session_state.input_currency = st.session_state.currency
+    st.session_state.input_fleet_type = st.session_state.fleet_type
+    st.session_state.input_operational_years = st.session_state.operational_years
+
+# Function to put a saved scenario's values back into the session, so the widgets show them
+def load_scenario(saved):
+    st.session_state.currency = saved["currency"]
+    st.session_state.inputs = {key: saved["scenario"][key] for key in DEFAULT_INPUTS}
+    st.session_state.fleet_inputs = {key: saved["scenario"][key] for key in DEFAULT_FLEET_INPUTS}
+    st.session_state.fleet_type = saved["scenario"]["fleet_type"]
+    st.session_state.operational_years = saved["operational_years"]
+    escalation_inputs = {key: value * (1 if key == "downtime_ramp" else 100)
+                         for key, value in saved["escalation"].items() if key != "periods_per_year"}
+    periods_per_year = saved["escalation"].get("periods_per_year", 1)
+    escalation_inputs["period_length"] = next(name for name, value in PERIODS_PER_YEAR.items() if value == periods_per_year)
+    st.session_state.escalation_inputs = {**st.session_state.escalation_inputs, **escalation_inputs}
+    set_input_widgets()
+
+# Saved scenarios, loaded before the inputs are drawn; saving happens once the scenario is priced
+store = get_store()
+saved_scenarios = st.sidebar.expander("Saved Scenarios")
+with saved_scenarios:
+    customer = st.text_input("Customer")
+    scenario_name = st.text_input("Scenario name")
+    if "store_message" in st.session_state:
+        st.caption(st.session_state.pop("store_message"))
+    saved = store.list_scenarios(customer=customer or None, limit=50)
+    if len(saved):
+        labels = {row.id: f"{row.customer} · {row.name or row.fleet_type} · {pd.Timestamp(row.created_at, unit='s'):%Y-%m-%d %H:%M}"
+                  for row in saved.itertuples()}
+        saved_id = st.selectbox("Saved scenario", list(labels), format_func=labels.get)
+        if st.button("Load"):
+            load_scenario(store.load(saved_id))
+profiler.lap("setup")
 
 with tab1:
     col = st.columns((1.7, 4.5, 1.8), gap='medium')
 
     with col[0]:
-        new_currency = st.selectbox("What kind of currency unit?", ["₹", "$"], index=0 if st.session_state.currency == "₹" else 1)
+        new_currency = st.selectbox("What kind of currency unit?", ["₹", "$"], index=0 if st.session_state.currency == "₹" else 1, key="input_currency")
 
         # If currency changes, convert all stored input values
         if new_currency != st.session_state.currency:
             for key, value in st.session_state.inputs.items():
                 st.session_state.inputs[key] = convert_currency(value, st.session_state.currency, new_currency)
             st.session_state.currency = new_currency
-        coulomb_partner_cost = st.session_state.inputs["coulomb_partner_cost"]
+            set_input_widgets(amounts_only=True)
         
         # Inputs
-        fleet_type = st.radio("Type of fleet", ["Captive Fleet", "Contracted Fleet", "DCO Fleet"])
-        operational_years = st.number_input("Years of operation", min_value=1, value=5)
-        # Inputs specific for type of fleet
-        if fleet_type == "Captive Fleet": 
-            st.markdown("##### Inputs for owning fleet")
-            vaqui_cost_ev2w = st.number_input("Vehicle Acquisition - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev2w"] / 1000) * 1000
-            st.session_state.inputs["vaqui_cost_ev2w"] = vaqui_cost_ev2w
-            vaqui_cost_ev3w = st.number_input("Vehicle Acquisition - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev3w"] / 1000) * 1000
-            st.session_state.inputs["vaqui_cost_ev3w"] = vaqui_cost_ev3w
-            gov_subsidy_ev2w = st.number_input("Government Subsidy - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev2w"] / 1000) * 1000
-            st.session_state.inputs["gov_subsidy_ev2w"] = gov_subsidy_ev2w
-            gov_subsidy_ev3w = st.number_input("Government Subsidy - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev3w"] / 1000) * 1000
-            st.session_state.inputs["gov_subsidy_ev3w"] = gov_subsidy_ev3w
-            state_incentive_ev2w = st.number_input("State-level Incentive - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev2w"] / 1000) * 1000
-            st.session_state.inputs["state_incentive_ev2w"] = state_incentive_ev2w
-            state_incentive_ev3w = st.number_input("State-level Incentive - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev3w"] / 1000) * 1000
-            st.session_state.inputs["state_incentive_ev3w"] = state_incentive_ev3w
-            manager_ownership_factor = st.number_input("Manager Ownership Percentage", min_value=0, max_value=100, value=80) / 100
-
-        elif fleet_type == "Contracted Fleet":
-            st.markdown("##### Contract Logistics")
-            contract_period = st.number_input("Contract Period (Months)", min_value=0, value= operational_years * 12)
-            contract_cost_ev2w = st.number_input("Contract Cost - 2W (per month)(Thousands)", min_value=0.0, value=st.session_state.inputs["contract_cost_ev2w"] / 1000) * 1000
-            st.session_state.inputs["contract_cost_ev2w"] = contract_cost_ev2w
-            contract_cost_ev3w = st.number_input("Contract Cost - 3W (per month)(Thousands)", min_value=0.0, value=st.session_state.inputs["contract_cost_ev3w"] / 1000) * 1000
-            st.session_state.inputs["contract_cost_ev3w"] = contract_cost_ev3w
-
-        elif fleet_type == "DCO Fleet":
-            st.markdown("##### DCO Logistics")
-            vaqui_cost_ev2w = st.number_input("Vehicle Acquisition - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev2w"] / 1000) * 1000
-            st.session_state.inputs["vaqui_cost_ev2w"] = vaqui_cost_ev2w
-            vaqui_cost_ev3w = st.number_input("Vehicle Acquisition - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev3w"] / 1000) * 1000
-            st.session_state.inputs["vaqui_cost_ev3w"] = vaqui_cost_ev3w
-            gov_subsidy_ev2w = st.number_input("Government Subsidy - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev2w"] / 1000) * 1000
-            st.session_state.inputs["gov_subsidy_ev2w"] = gov_subsidy_ev2w
-            gov_subsidy_ev3w = st.number_input("Government Subsidy - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev3w"] / 1000) * 1000
-            st.session_state.inputs["gov_subsidy_ev3w"] = gov_subsidy_ev3w
-            state_incentive_ev2w = st.number_input("State-level Incentive - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev2w"] / 1000) * 1000
-            st.session_state.inputs["state_incentive_ev2w"] = state_incentive_ev2w
-            state_incentive_ev3w = st.number_input("State-level Incentive - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev3w"] / 1000) * 1000
-            st.session_state.inputs["state_incentive_ev3w"] = state_incentive_ev3w
-
-        # Additional Logistics consistent across all types of fleets
-        basic_insurance_2w = st.number_input("Basic Insurance - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["basic_insurance_2w"] / 1000) * 1000
-        st.session_state.inputs["basic_insurance_2w"] = basic_insurance_2w
-        basic_insurance_3w = st.number_input("Basic Insurance - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["basic_insurance_3w"] / 1000) * 1000
-        st.session_state.inputs["basic_insurance_3w"] = basic_insurance_3w
-        annual_maintenance_cost = st.number_input("Annual Maintenance/Van (Thousands)", min_value=0.0, value=st.session_state.inputs["annual_maintenance_cost"] / 1000) * 1000
-        st.session_state.inputs["annual_maintenance_cost"] = annual_maintenance_cost
-        battery_replacement_cost_2w = st.number_input("Annual Battery Replacement - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["battery_replacement_cost_2w"] / 1000) * 1000
-        st.session_state.inputs["battery_replacement_cost_2w"] = battery_replacement_cost_2w
-        battery_replacement_cost_3w = st.number_input("Annual Battery Replacement - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["battery_replacement_cost_3w"] / 1000) * 1000
-        st.session_state.inputs["battery_replacement_cost_3w"] = battery_replacement_cost_3w
-
-        # Delivery Logistics
-        st.markdown("##### Delivery Logistics")
-        num_vans_2w = st.number_input("Number of Vans - 2W", min_value=0, value=0)
-        num_vans_3w = st.number_input("Number of Vans - 3W", min_value=0, value=1)
-        daily_average_km_2w = st.number_input("Average Daily km - 2W", min_value=0, value=65)
-        daily_average_km_3w = st.number_input("Average Daily km - 3W", min_value=0, value=90)
-        electricity_cost_per_km = st.number_input("Electricity Cost per km", min_value=0.0, value=st.session_state.inputs["electricity_cost_per_km"])
-        st.session_state.inputs["electricity_cost_per_km"] = electricity_cost_per_km
-
-        # Worker Logistics
-        st.markdown("##### Worker Logistics")
-        rev_km = st.number_input("Revenue per km", min_value=0.0, value=st.session_state.inputs["rev_km"])
-        st.session_state.inputs["rev_km"] = rev_km
-        driver_wage_2w = st.number_input("Hourly Driver Wage - 2W", min_value=0.0, value=st.session_state.inputs["driver_wage_2w"])
-        st.session_state.inputs["driver_wage_2w"] = driver_wage_2w
-        driver_wage_3w = st.number_input("Hourly Driver Wage - 3W", min_value=0.0, value=st.session_state.inputs["driver_wage_3w"])
-        st.session_state.inputs["driver_wage_3w"] = driver_wage_3w
-        work_hours = st.number_input("Work hours per day", min_value=0, value=10)
-        work_days = st.number_input("Work days per year", min_value=0, value=300)
-
-        # Downtime costs/percentages
-        st.markdown("##### Downtime Percentages")
-        battery_issues = st.number_input("Percentage of battery problems faced per year", min_value=0, max_value=100, value=2)
-        software_issues = st.number_input("Percentage of software problems faced per year", min_value=0, max_value=100, value=3)
+        fleet_type = st.radio("Type of fleet", FLEET_TYPES, index=FLEET_TYPES.index(st.session_state.fleet_type), key="input_fleet_type")
+        st.session_state.fleet_type = fleet_type
+        operational_years = st.number_input("Years of operation", min_value=1, value=st.session_state.operational_years, key="input_operational_years")
+        st.session_state.operational_years = operational_years
+        # The remaining inputs wait for Apply, so an edit session reruns the page once
+        with st.form("input_form", border=False):
+            # Inputs specific for type of fleet
+            if fleet_type == "Captive Fleet": 
+                st.markdown("##### Inputs for owning fleet")
+                vaqui_cost_ev2w = st.number_input("Vehicle Acquisition - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev2w"] / 1000, key="input_vaqui_cost_ev2w") * 1000
+                st.session_state.inputs["vaqui_cost_ev2w"] = vaqui_cost_ev2w
+                vaqui_cost_ev3w = st.number_input("Vehicle Acquisition - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev3w"] / 1000, key="input_vaqui_cost_ev3w") * 1000
+                st.session_state.inputs["vaqui_cost_ev3w"] = vaqui_cost_ev3w
+                gov_subsidy_ev2w = st.number_input("Government Subsidy - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev2w"] / 1000, key="input_gov_subsidy_ev2w") * 1000
+                st.session_state.inputs["gov_subsidy_ev2w"] = gov_subsidy_ev2w
+                gov_subsidy_ev3w = st.number_input("Government Subsidy - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev3w"] / 1000, key="input_gov_subsidy_ev3w") * 1000
+                st.session_state.inputs["gov_subsidy_ev3w"] = gov_subsidy_ev3w
+                state_incentive_ev2w = st.number_input("State-level Incentive - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev2w"] / 1000, key="input_state_incentive_ev2w") * 1000
+                st.session_state.inputs["state_incentive_ev2w"] = state_incentive_ev2w
+                state_incentive_ev3w = st.number_input("State-level Incentive - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev3w"] / 1000, key="input_state_incentive_ev3w") * 1000
+                st.session_state.inputs["state_incentive_ev3w"] = state_incentive_ev3w
+                manager_ownership_factor = st.number_input("Manager Ownership Percentage", min_value=0, max_value=100, value=round(st.session_state.fleet_inputs["manager_ownership_factor"] * 100), key="input_manager_ownership_factor") / 100
+                st.session_state.fleet_inputs["manager_ownership_factor"] = manager_ownership_factor
+
+            elif fleet_type == "Contracted Fleet":
+                st.markdown("##### Contract Logistics")
+                contract_period = st.number_input("Contract Period (Months)", min_value=0, value= operational_years * 12)
+                contract_cost_ev2w = st.number_input("Contract Cost - 2W (per month)(Thousands)", min_value=0.0, value=st.session_state.inputs["contract_cost_ev2w"] / 1000, key="input_contract_cost_ev2w") * 1000
+                st.session_state.inputs["contract_cost_ev2w"] = contract_cost_ev2w
+                contract_cost_ev3w = st.number_input("Contract Cost - 3W (per month)(Thousands)", min_value=0.0, value=st.session_state.inputs["contract_cost_ev3w"] / 1000, key="input_contract_cost_ev3w") * 1000
+                st.session_state.inputs["contract_cost_ev3w"] = contract_cost_ev3w
+
+            elif fleet_type == "DCO Fleet":
+                st.markdown("##### DCO Logistics")
+                vaqui_cost_ev2w = st.number_input("Vehicle Acquisition - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev2w"] / 1000, key="input_vaqui_cost_ev2w") * 1000
+                st.session_state.inputs["vaqui_cost_ev2w"] = vaqui_cost_ev2w
+                vaqui_cost_ev3w = st.number_input("Vehicle Acquisition - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["vaqui_cost_ev3w"] / 1000, key="input_vaqui_cost_ev3w") * 1000
+                st.session_state.inputs["vaqui_cost_ev3w"] = vaqui_cost_ev3w
+                gov_subsidy_ev2w = st.number_input("Government Subsidy - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev2w"] / 1000, key="input_gov_subsidy_ev2w") * 1000
+                st.session_state.inputs["gov_subsidy_ev2w"] = gov_subsidy_ev2w
+                gov_subsidy_ev3w = st.number_input("Government Subsidy - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["gov_subsidy_ev3w"] / 1000, key="input_gov_subsidy_ev3w") * 1000
+                st.session_state.inputs["gov_subsidy_ev3w"] = gov_subsidy_ev3w
+                state_incentive_ev2w = st.number_input("State-level Incentive - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev2w"] / 1000, key="input_state_incentive_ev2w") * 1000
+                st.session_state.inputs["state_incentive_ev2w"] = state_incentive_ev2w
+                state_incentive_ev3w = st.number_input("State-level Incentive - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["state_incentive_ev3w"] / 1000, key="input_state_incentive_ev3w") * 1000
+                st.session_state.inputs["state_incentive_ev3w"] = state_incentive_ev3w
+
+            # Additional Logistics consistent across all types of fleets
+            basic_insurance_2w = st.number_input("Basic Insurance - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["basic_insurance_2w"] / 1000, key="input_basic_insurance_2w") * 1000
+            st.session_state.inputs["basic_insurance_2w"] = basic_insurance_2w
+            basic_insurance_3w = st.number_input("Basic Insurance - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["basic_insurance_3w"] / 1000, key="input_basic_insurance_3w") * 1000
+            st.session_state.inputs["basic_insurance_3w"] = basic_insurance_3w
+            annual_maintenance_cost = st.number_input("Annual Maintenance/Van (Thousands)", min_value=0.0, value=st.session_state.inputs["annual_maintenance_cost"] / 1000, key="input_annual_maintenance_cost") * 1000
+            st.session_state.inputs["annual_maintenance_cost"] = annual_maintenance_cost
+            battery_replacement_cost_2w = st.number_input("Annual Battery Replacement - 2W (Thousands)", min_value=0.0, value=st.session_state.inputs["battery_replacement_cost_2w"] / 1000, key="input_battery_replacement_cost_2w") * 1000
+            st.session_state.inputs["battery_replacement_cost_2w"] = battery_replacement_cost_2w
+            battery_replacement_cost_3w = st.number_input("Annual Battery Replacement - 3W (Thousands)", min_value=0.0, value=st.session_state.inputs["battery_replacement_cost_3w"] / 1000, key="input_battery_replacement_cost_3w") * 1000
+            st.session_state.inputs["battery_replacement_cost_3w"] = battery_replacement_cost_3w
+
+            # Delivery Logistics
+            st.markdown("##### Delivery Logistics")
+            num_vans_2w = st.number_input("Number of Vans - 2W", min_value=0, value=round(st.session_state.fleet_inputs["num_vans_2w"]), key="input_num_vans_2w")
+            st.session_state.fleet_inputs["num_vans_2w"] = num_vans_2w
+            num_vans_3w = st.number_input("Number of Vans - 3W", min_value=0, value=round(st.session_state.fleet_inputs["num_vans_3w"]), key="input_num_vans_3w")
+            st.session_state.fleet_inputs["num_vans_3w"] = num_vans_3w
+            daily_average_km_2w = st.number_input("Average Daily km - 2W", min_value=0, value=round(st.session_state.fleet_inputs["daily_average_km_2w"]), key="input_daily_average_km_2w")
+            st.session_state.fleet_inputs["daily_average_km_2w"] = daily_average_km_2w
+            daily_average_km_3w = st.number_input("Average Daily km - 3W", min_value=0, value=round(st.session_state.fleet_inputs["daily_average_km_3w"]), key="input_daily_average_km_3w")
+            st.session_state.fleet_inputs["daily_average_km_3w"] = daily_average_km_3w
+            electricity_cost_per_km = st.number_input("Electricity Cost per km", min_value=0.0, value=st.session_state.inputs["electricity_cost_per_km"], key="input_electricity_cost_per_km")
+            st.session_state.inputs["electricity_cost_per_km"] = electricity_cost_per_km
+
+            # Worker Logistics
+            st.markdown("##### Worker Logistics")
+            rev_km = st.number_input("Revenue per km", min_value=0.0, value=st.session_state.inputs["rev_km"], key="input_rev_km")
+            st.session_state.inputs["rev_km"] = rev_km
+            driver_wage_2w = st.number_input("Hourly Driver Wage - 2W", min_value=0.0, value=st.session_state.inputs["driver_wage_2w"], key="input_driver_wage_2w")
+            st.session_state.inputs["driver_wage_2w"] = driver_wage_2w
+            driver_wage_3w = st.number_input("Hourly Driver Wage - 3W", min_value=0.0, value=st.session_state.inputs["driver_wage_3w"], key="input_driver_wage_3w")
+            st.session_state.inputs["driver_wage_3w"] = driver_wage_3w
+            work_hours = st.number_input("Work hours per day", min_value=0, value=round(st.session_state.fleet_inputs["work_hours"]), key="input_work_hours")
+            st.session_state.fleet_inputs["work_hours"] = work_hours
+            work_days = st.number_input("Work days per year", min_value=0, value=round(st.session_state.fleet_inputs["work_days"]), key="input_work_days")
+            st.session_state.fleet_inputs["work_days"] = work_days
+
+            # Downtime costs/percentages
+            st.markdown("##### Downtime Percentages")
+            battery_issues = st.number_input("Percentage of battery problems faced per year", min_value=0, max_value=100, value=round(st.session_state.fleet_inputs["battery_issues"]), key="input_battery_issues")
+            st.session_state.fleet_inputs["battery_issues"] = battery_issues
+            software_issues = st.number_input("Percentage of software problems faced per year", min_value=0, max_value=100, value=round(st.session_state.fleet_inputs["software_issues"]), key="input_software_issues")
+            st.session_state.fleet_inputs["software_issues"] = software_issues
+
+            # Cost escalation over the years of operation
+            st.markdown("##### Cost Escalation")
+            escalation_inputs = st.session_state.escalation_inputs
+            escalation_inputs["period_length"] = st.selectbox("Projection Periods", list(PERIODS_PER_YEAR),
+                                                              index=list(PERIODS_PER_YEAR).index(escalation_inputs["period_length"]), key="input_period_length")
+            escalation_inputs["wage_inflation"] = st.number_input("Wage Inflation (% per year)", min_value=0.0, value=escalation_inputs["wage_inflation"], key="input_wage_inflation")
+            escalation_inputs["electricity_inflation"] = st.number_input("Electricity Inflation (% per year)", min_value=0.0, value=escalation_inputs["electricity_inflation"], key="input_electricity_inflation")
+            escalation_inputs["battery_fade"] = st.number_input("Battery Capacity Fade (% per year)", min_value=0.0, max_value=99.0, value=escalation_inputs["battery_fade"], key="input_battery_fade")
+            escalation_inputs["downtime_ramp"] = st.number_input("Downtime Increase (percentage points per year)", min_value=0.0, value=escalation_inputs["downtime_ramp"], key="input_downtime_ramp")
+            escalation_inputs["discount_rate"] = st.number_input("Discount Rate for NPV (% per year)", min_value=0.0, value=escalation_inputs["discount_rate"], key="input_discount_rate")
+            escalation = {
+                "periods_per_year": PERIODS_PER_YEAR[escalation_inputs["period_length"]],
+                "wage_inflation": escalation_inputs["wage_inflation"] / 100,
+                "electricity_inflation": escalation_inputs["electricity_inflation"] / 100,
+                "battery_fade": escalation_inputs["battery_fade"] / 100,
+                "downtime_ramp": escalation_inputs["downtime_ramp"],
+                "discount_rate": escalation_inputs["discount_rate"] / 100,
+            }
+            st.form_submit_button("Apply", type="primary", use_container_width=True)
+
+        # Uncertainty around the point estimates
+        st.markdown("##### Uncertainty")
+        monte_carlo = st.toggle("Monte Carlo mode", value=False)
+        if monte_carlo:
+            num_samples = st.number_input("Number of samples", min_value=1000, max_value=200000, value=50000, step=1000)
+            point_estimates = {
+                "battery_issues": ("Battery problems", battery_issues),
+                "software_issues": ("Software problems", software_issues),
+                "daily_average_km_2w": ("Average Daily km - 2W", daily_average_km_2w),
+                "daily_average_km_3w": ("Average Daily km - 3W", daily_average_km_3w),
+                "rev_km": ("Revenue per km", rev_km),
+                "driver_wage_2w": ("Hourly Driver Wage - 2W", driver_wage_2w),
+                "driver_wage_3w": ("Hourly Driver Wage - 3W", driver_wage_3w),
+            }
+            distributions = {}
+            with st.form("uncertainty_form", border=False):
+                for key in UNCERTAIN_INPUTS:
+                    label, value = point_estimates[key]
+                    kind = st.selectbox(f"Distribution - {label}", DISTRIBUTION_KINDS, index=1, key=f"distribution_{key}")
+                    spread = st.number_input(f"Spread - {label} (%)", min_value=0, max_value=100, value=10, key=f"spread_{key}") / 100
+                    distributions[key] = spread_distribution(kind, value, spread)
+                st.form_submit_button("Apply uncertainty", type="primary", use_container_width=True)
+        profiler.lap("inputs")
 
     with col[2]:
-        # Calculating costs
-        if fleet_type == "Captive Fleet":
-            # Cost of new vehicles (Initial Costs)
-            on_road_price_ev2w = vaqui_cost_ev2w - gov_subsidy_ev2w - state_incentive_ev2w
-            on_road_price_ev3w = vaqui_cost_ev3w - gov_subsidy_ev3w - state_incentive_ev3w
-            init_cost = (on_road_price_ev2w * num_vans_2w + on_road_price_ev3w * num_vans_3w)
-            coulomb_init_cost = init_cost
-
-            # Get annual revenue
-            annual_revenue = get_annual_revenue(battery_issues, software_issues, num_vans_2w, num_vans_3w, rev_km, work_days, daily_average_km_2w, daily_average_km_3w) * manager_ownership_factor
-            coulomb_annual_revenue = get_annual_revenue(battery_issues * 0.5, software_issues * 0.5, num_vans_2w, num_vans_3w, rev_km, work_days, daily_average_km_2w, daily_average_km_3w) * manager_ownership_factor
-
-            # Get annual costs
-            amortization_cost = (on_road_price_ev2w * num_vans_2w + on_road_price_ev3w + num_vans_3w) / operational_years
-            annual_costs = get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
-                    work_hours, work_days, annual_maintenance_cost, battery_replacement_cost_2w, battery_replacement_cost_3w,
-                    driver_wage_2w, driver_wage_3w, battery_issues, software_issues, annual_revenue, amortization_cost, basic_insurance_2w, basic_insurance_3w)
-            coulomb_annual_costs = get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
-                    work_hours, work_days, annual_maintenance_cost * 0.75, battery_replacement_cost_2w * 0.75, battery_replacement_cost_3w * 0.75,
-                    driver_wage_2w, driver_wage_3w, battery_issues * 0.5, software_issues * 0.5, coulomb_annual_revenue, amortization_cost, basic_insurance_2w, basic_insurance_3w) + coulomb_partner_cost * (num_vans_2w + num_vans_3w)
-        elif fleet_type == "DCO Fleet":
-            # Calculate Initial Costs
-            on_road_price_ev2w = vaqui_cost_ev2w - gov_subsidy_ev2w - state_incentive_ev2w
-            on_road_price_ev3w = vaqui_cost_ev3w - gov_subsidy_ev3w - state_incentive_ev3w
-            init_cost = (on_road_price_ev2w * num_vans_2w + on_road_price_ev3w * num_vans_3w)
-            coulomb_init_cost = init_cost
-
-            # Calculate Revenue
-            annual_revenue = get_annual_revenue(battery_issues, software_issues, num_vans_2w, num_vans_3w, rev_km, work_days, daily_average_km_2w, daily_average_km_3w)
-            coulomb_annual_revenue = get_annual_revenue(battery_issues * 0.5, software_issues * 0.5, num_vans_2w, num_vans_3w, rev_km, work_days, daily_average_km_2w, daily_average_km_3w)
-
-            # Calculate Annual Cost
-            amortization_cost = (on_road_price_ev2w * num_vans_2w + on_road_price_ev3w + num_vans_3w) / operational_years
-            annual_costs = get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
-                    work_hours, work_days, annual_maintenance_cost, battery_replacement_cost_2w, battery_replacement_cost_3w,
-                    driver_wage_2w, driver_wage_3w, battery_issues, software_issues, annual_revenue, amortization_cost, basic_insurance_2w, basic_insurance_3w)
-            coulomb_annual_costs = get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
-                    work_hours, work_days, annual_maintenance_cost * 0.75, battery_replacement_cost_2w * 0.75, battery_replacement_cost_3w * 0.75,
-                    driver_wage_2w, driver_wage_3w, battery_issues * 0.5, software_issues * 0.5, coulomb_annual_revenue, amortization_cost, basic_insurance_2w, basic_insurance_3w) + coulomb_partner_cost * (num_vans_2w + num_vans_3w)
-        elif fleet_type == "Contracted Fleet":
-            # Cost of contracted vehicles (Initial Costs)
-            on_road_price_ev2w = contract_cost_ev2w * 12
-            on_road_price_ev3w = contract_cost_ev3w * 12
-            init_cost = (on_road_price_ev2w * num_vans_2w + on_road_price_ev3w * num_vans_3w)
-            coulomb_init_cost = init_cost
-
-            # Calculate total revenue accounting for missed_deliveries
-            annual_revenue = get_annual_revenue(battery_issues, software_issues, num_vans_2w, num_vans_3w, rev_km, work_days, daily_average_km_2w, daily_average_km_3w)
-            coulomb_annual_revenue = get_annual_revenue(battery_issues * 0.5, software_issues * 0.5, num_vans_2w, num_vans_3w, rev_km, work_days, daily_average_km_2w, daily_average_km_3w)
-
-            # Calculate costs
-            annual_costs = get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
-                    work_hours, work_days, annual_maintenance_cost, battery_replacement_cost_2w, battery_replacement_cost_3w,
-                    driver_wage_2w, driver_wage_3w, battery_issues, software_issues, annual_revenue, 0, basic_insurance_2w, basic_insurance_3w) + init_cost
-            coulomb_annual_costs = get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
-                    work_hours, work_days, annual_maintenance_cost * 0.75, battery_replacement_cost_2w * 0.75, battery_replacement_cost_3w * 0.75,
-                    driver_wage_2w, driver_wage_3w, battery_issues * 0.5, software_issues * 0.5, coulomb_annual_revenue, 0, basic_insurance_2w, basic_insurance_3w) + init_cost + coulomb_partner_cost * (num_vans_2w + num_vans_3w)
-
-        # Calculating data for revenue, costs, profits, and payback_period
-        years = list(range(operational_years + 1))
-        revenues = [0]
-        costs = [init_cost]
-        profits = [-init_cost]
-        payback_period = None
-        coulomb_revenues = [0]
-        coulomb_costs = [coulomb_init_cost]
-        coulomb_profits = [-coulomb_init_cost]
-        coulomb_payback_period = None
-
-        for year in range(1, operational_years + 1):
-            previous_profit = profits[-1]
-            previous_coulomb_profit = coulomb_profits[-1]
-            yearly_profit = previous_profit + annual_revenue - annual_costs
-            coulomb_yearly_profit = previous_coulomb_profit + coulomb_annual_revenue - coulomb_annual_costs
-
-            revenues.append(annual_revenue)
-            coulomb_revenues.append(coulomb_annual_revenue)
-            costs.append(annual_costs)
-            coulomb_costs.append(coulomb_annual_costs)
-            profits.append(yearly_profit)
-            coulomb_profits.append(coulomb_yearly_profit)
-            if previous_profit < 0 < yearly_profit:
-                payback_period = year - 1 - previous_profit / (yearly_profit - previous_profit)
-            if previous_coulomb_profit < 0 < coulomb_yearly_profit:
-                coulomb_payback_period = year - 1 - previous_coulomb_profit / (coulomb_yearly_profit - previous_coulomb_profit)
-        
-        # Create DataFrame
-        profits_data = pd.DataFrame({
-            "Year": range(0, operational_years + 1),
-            "Revenue": revenues,
-            "Cost": costs,
-            "Cumulative Profit": profits,
-        })
-        coulomb_profits_data = pd.DataFrame({
-            "Year": range(0, operational_years + 1),
-            "Revenue": coulomb_revenues,
-            "Cost": coulomb_costs,
-            "Cumulative Profit": coulomb_profits,
-        })
-        
-        # Calculate cost savings
-        total_cost = sum(costs)
-        coulomb_total_cost = sum(coulomb_costs)
-
-        # Calculate ROI
-        final_profit = profits[-1]  # Last year's cumulative profit
-        coulomb_final_profit = coulomb_profits[-1]
-        roi = (final_profit / total_cost) * 100 if total_cost > 0 else 0
-        coulomb_roi = (coulomb_final_profit / coulomb_total_cost) * 100 if coulomb_total_cost > 0 else 0
-
-        # Fleet utilization
-        total_possible_hours = 10 * 300
-        total_hours = work_hours * work_days * (1 - (battery_issues + software_issues) / 100)
-        coulomb_total_hours = work_hours * work_days * (1 - (battery_issues + software_issues) * 0.5 / 100)
-        fleet_utilization = total_hours / total_possible_hours
-        coulomb_fleet_utilization = coulomb_total_hours / total_possible_hours
-
-        using_coulomb = st.toggle("Using Coulomb", value=True)
-        # Display Metrics
-        if using_coulomb:
-            st.metric(label="Return on Investment (ROI)", value=f"{coulomb_roi:.2f}%", delta=f"{coulomb_roi - 100:.2f}%", delta_color="normal")
-            if coulomb_payback_period and payback_period:
-                st.metric(label="Payback Period (Years)", value=f"{coulomb_payback_period:.2f}", delta=f"{coulomb_payback_period - payback_period:.2f}", delta_color="inverse")
-            elif coulomb_payback_period:
-                st.metric(label="Payback Period (Years)", value=f"{coulomb_payback_period:.2f}")
-            else:
-                st.metric(label="Payback Period (Years)", value=f"Cannot with given years of operation")
-            st.metric(label="Fleet Utilization", value=f"{coulomb_fleet_utilization:,.2f}", delta=f"{coulomb_fleet_utilization - fleet_utilization:.2f}", delta_color="normal")
-            st.metric(label="Cost Savings", value=f"{new_currency}{total_cost - coulomb_total_cost:,.2f}", delta=f"{total_cost - coulomb_total_cost:,.2f}", delta_color="normal")
-        else:
-            st.metric(label="Return on Investment (ROI)", value=f"{roi:.2f}%", delta=f"{roi - 100:.2f}%", delta_color="normal")
-            if coulomb_payback_period and payback_period:
-                st.metric(label="Payback Period (Years)", value=f"{payback_period:.2f}", delta=f"{payback_period - coulomb_payback_period:.2f}", delta_color="inverse")
-            elif payback_period:
-                st.metric(label="Payback Period (Years)", value=f"{payback_period:.2f}")
-            else:
-                st.metric(label="Payback Period (Years)", value=f"Cannot with given years of operation")
-            st.metric(label="Fleet Utilization", value=f"{fleet_utilization:,.2f}", delta=f"{fleet_utilization - coulomb_fleet_utilization:.2f}", delta_color="normal")
-            st.metric(label="Cost Savings", value=f"{new_currency}0", delta=f"{coulomb_total_cost - total_cost:,.2f}", delta_color="normal")
+        # Price the fleet without and with Coulomb in one batched call
+        scenario = {
+            **st.session_state.inputs,
+            "fleet_type": fleet_type,
+            "num_vans_2w": num_vans_2w,
+            "num_vans_3w": num_vans_3w,
+            "daily_average_km_2w": daily_average_km_2w,
+            "daily_average_km_3w": daily_average_km_3w,
+            "work_hours": work_hours,
+            "work_days": work_days,
+            "battery_issues": battery_issues,
+            "software_issues": software_issues,
+            # Kept for every fleet type so the Compare tab's Captive row does not depend on the selected type
+            "manager_ownership_factor": st.session_state.fleet_inputs["manager_ownership_factor"],
+        }
+        # Priced once in ₹ for every session, then converted to the currency on screen
+        rupee_scenario = to_rupees(scenario, new_currency)
+        projection_key = canonical_key({"scenario": rupee_scenario, "operational_years": operational_years, "escalation": escalation})
+        projection = shared_cache.get_or_compute(
+            projection_key, lambda: project_scenario(rupee_scenario, operational_years, escalation))
+        if new_currency != "₹":
+            projection = shared_cache.get_or_compute(
+                (projection_key, new_currency), lambda: projection_in_currency(projection, new_currency))
+        # Save the priced scenario for the customer entered in the sidebar
+        if saved_scenarios.button("Save current scenario", disabled=not customer):
+            saved_id, reused = store.save(customer, scenario, operational_years, new_currency, escalation, scenario_name)
+            st.session_state.store_message = f"Saved scenario {saved_id}" + (" (inputs seen before, stored result reused)" if reused else "")
+            st.rerun()
+        if monte_carlo:
+            simulation_key = canonical_key({"projection": projection_key, "currency": new_currency,
+                                            "distributions": distributions, "samples": num_samples})
+            simulation = run_monte_carlo(scenario, distributions, operational_years, num_samples, escalation)
+        profiler.lap("projection")
+
+        # Revenue, costs, profits and payback_period
+        profits_data = projection["baseline"]["profits_data"]
+        coulomb_profits_data = projection["coulomb"]["profits_data"]
+        payback_period = projection["baseline"]["payback_period"]
+        coulomb_payback_period = projection["coulomb"]["payback_period"]
+
+        metrics_panel(projection, simulation if monte_carlo else None, new_currency)
+        profiler.lap("metrics")
 
     
     with col[1]:
@@ -329,10 +494,157 @@ with tab1:
         df = pd.DataFrame(data)
 
         st.markdown("### Cumulative Net Profits")
-        generate_plot(profits_data, payback_period, new_currency)
+        if monte_carlo:
+            generate_band_plot(simulation["years"], simulation["baseline"]["profit_bands"], new_currency,
+                               shared_cache, (simulation_key, "baseline", new_currency))
+        else:
+            generate_plot(profits_data, payback_period, new_currency,
+                          shared_cache, (projection_key, "baseline", new_currency))
         st.markdown("### Coulomb Benefits")
         st.text("By using Coulomb, operational costs (maintenance and battery) can be lowered by at least 25%")
         st.text("It also decreases the chance of battery/software issues by 50%, decreasing missed deliveries")
         st.text("Below, you can see the cumulative net profits if you were using Coulomb")
         st.markdown("### Cumulative Net Profits w/Coulomb")
-        generate_plot(coulomb_profits_data, coulomb_payback_period, new_currency)
\ No newline at end of file
+        if monte_carlo:
+            generate_band_plot(simulation["years"], simulation["coulomb"]["profit_bands"], new_currency,
+                               shared_cache, (simulation_key, "coulomb", new_currency))
+            st.markdown("### Payback Period Distribution")
+            generate_payback_histogram({
+                "Without Coulomb": simulation["baseline"]["payback_period"],
+                "With Coulomb": simulation["coulomb"]["payback_period"],
+            }, spec_cache=shared_cache, cache_key=(simulation_key, "payback"))
+        else:
+            generate_plot(coulomb_profits_data, coulomb_payback_period, new_currency,
+                          shared_cache, (projection_key, "coulomb", new_currency))
+        cost_breakdown_chart(projection, projection_key, new_currency)
+        profiler.lap("charts")
+
+with tab2:
+    col = st.columns((1.7, 6.3), gap='medium')
+    sensitivity_fields = list(DEFAULT_INPUTS) + [key for key in DEFAULT_FLEET_INPUTS if key != "manager_ownership_factor"]
+
+    with col[0]:
+        metric = st.selectbox("Metric", list(METRICS), format_func=METRICS.get)
+        sensitivity_scenario = st.radio("Scenario", list(SCENARIOS), index=1, format_func=SCENARIOS.get)
+        change = st.number_input("Input change for tornado (%)", min_value=1, max_value=100, value=10) / 100
+
+        # Grid sweep
+        st.markdown("##### Grid sweep")
+        x_field = st.selectbox("X axis input", sensitivity_fields, index=sensitivity_fields.index("num_vans_2w"))
+        x_low = st.number_input("X axis from", value=0.0)
+        x_high = st.number_input("X axis to", value=100.0)
+        y_field = st.selectbox("Y axis input", sensitivity_fields, index=sensitivity_fields.index("rev_km"))
+        y_low = st.number_input("Y axis from", value=10.0)
+        y_high = st.number_input("Y axis to", value=50.0)
+        steps = st.number_input("Steps per axis", min_value=2, max_value=500, value=100)
+        color_scheme = st.selectbox("Colour scale", ["viridis", "plasma", "inferno", "magma", "blues", "redyellowgreen"])
+
+    with col[1]:
+        st.title("Sensitivity Analysis")
+        st.markdown("### Which inputs move the result the most")
+        tornado_data = run_tornado(scenario, operational_years, metric, change, escalation)
+        generate_tornado_plot(tornado_data[tornado_data["Scenario"] == SCENARIOS[sensitivity_scenario]], METRICS[metric],
+                              shared_cache, ("tornado", projection_key, new_currency, metric, change, sensitivity_scenario))
+
+        st.markdown("### Grid sweep")
+        if x_field == y_field:
+            st.warning("Pick two different inputs for the grid sweep")
+        elif x_high <= x_low or y_high <= y_low:
+            st.warning("Each axis needs a range with the upper value above the lower value")
+        else:
+            sweep = run_grid_sweep(scenario, operational_years, x_field, (x_low, x_high), y_field, (y_low, y_high), steps, metric, escalation)
+            x_view = st.slider("Show X axis range", min_value=x_low, max_value=x_high, value=(x_low, x_high))
+            y_view = st.slider("Show Y axis range", min_value=y_low, max_value=y_high, value=(y_low, y_high))
+            # The cells in view are kept with the sweep, so reruns that do not change it reuse them
+            grid_key = canonical_key({"scenario": scenario, "operational_years": operational_years, "escalation": escalation,
+                                      "x": (x_field, x_low, x_high), "y": (y_field, y_low, y_high), "steps": steps,
+                                      "metric": metric, "side": sensitivity_scenario, "view": (x_view, y_view)})
+            grid_data = shared_cache.get_or_compute(grid_key, lambda: grid_frame(sweep, sensitivity_scenario, x_view, y_view))
+            generate_heatmap(grid_data, cell_size(sweep["x"]), cell_size(sweep["y"]), x_field, y_field, METRICS[metric], color_scheme,
+                             shared_cache, (grid_key, "heatmap", color_scheme))
+        profiler.lap("sensitivity")
+
+with tab3:
+    col = st.columns((1.7, 6.3), gap='medium')
+
+    with col[0]:
+        # Searching is heavier than a normal rerun, so it only runs when the form is submitted
+        with st.form("optimizer"):
+            st.markdown(f"##### Search for the best {fleet_type}")
+            budget = st.number_input("Capital Budget (Thousands)", min_value=0.0, value=convert_currency(10000.0, "₹", new_currency)) * 1000
+            objective = st.selectbox("Objective", list(OBJECTIVES), format_func=OBJECTIVES.get)
+            max_2w = st.number_input("Maximum Vans - 2W", min_value=0, value=5000)
+            max_3w = st.number_input("Maximum Vans - 3W", min_value=0, value=5000)
+            km_2w_range = st.slider("Average Daily km - 2W", min_value=0, max_value=300, value=(40, 120))
+            km_3w_range = st.slider("Average Daily km - 3W", min_value=0, max_value=300, value=(60, 150))
+            optimize = st.form_submit_button("Optimize")
+        if optimize:
+            st.session_state.optimizer_result = {
+                "objective": objective,
+                "currency": new_currency,
+                "result": optimize_fleet(scenario, operational_years, budget, objective, max_2w, max_3w,
+                                         km_2w_range, km_3w_range, **escalation),
+            }
+
+    with col[1]:
+        st.title("Fleet Mix Optimizer")
+        if "optimizer_result" not in st.session_state:
+            st.text("Set a capital budget and objective, then press Optimize")
+        else:
+            optimized = st.session_state.optimizer_result
+            objective_title = METRICS[optimized["objective"]]
+            st.text(f"Evaluated {optimized['result']['evaluated']:,} fleet mix and daily km combinations on the edge of the budget")
+            fronts = []
+            for name, label in (("baseline", "Without Coulomb"), ("coulomb", "With Coulomb")):
+                best = optimized["result"][name]["best"]
+                st.markdown(f"### Best fleet {label.lower()}")
+                if best is None:
+                    st.text("No fleet within the budget reaches the objective")
+                    continue
+                best_col = st.columns(4)
+                best_col[0].metric(label="Vans - 2W", value=f"{best['num_vans_2w']:,.0f}")
+                best_col[1].metric(label="Vans - 3W", value=f"{best['num_vans_3w']:,.0f}")
+                best_col[2].metric(label="Capital", value=f"{optimized['currency']}{best['capital']:,.2f}")
+                best_col[3].metric(label=objective_title, value=f"{best[optimized['objective']]:,.2f}")
+                front = optimized["result"][name]["front"].rename(columns={optimized["objective"]: "objective"})
+                fronts.append(front.assign(Scenario=label))
+            if fronts:
+                st.markdown("### Pareto front")
+                generate_pareto_plot(pd.concat(fronts, ignore_index=True), objective_title, optimized["currency"])
+        profiler.lap("optimizer")
+
+with tab4:
+    st.title("Fleet Type Comparison")
+    st.text("The inputs from the Metrics tab priced as each type of fleet, without and with Coulomb")
+    comparison_key = canonical_key({"comparison": {key: value for key, value in rupee_scenario.items() if key != "fleet_type"},
+                                    "operational_years": operational_years, "escalation": escalation})
+    comparison = shared_cache.get_or_compute(
+        comparison_key, lambda: compare_fleets(rupee_scenario, operational_years, escalation))
+    if new_currency != "₹":
+        comparison = shared_cache.get_or_compute(
+            (comparison_key, new_currency), lambda: comparison_in_currency(comparison, new_currency))
+
+    st.markdown("### Summary")
+    st.dataframe(comparison["summary"], hide_index=True, use_container_width=True, column_config={
+        "ROI (%)": st.column_config.NumberColumn(format="%.2f"),
+        "Payback Period (Years)": st.column_config.NumberColumn(format="%.2f"),
+        "Fleet Utilization": st.column_config.NumberColumn(format="%.2f"),
+        "Cost Savings": st.column_config.NumberColumn(format=f"{new_currency}%.2f"),
+        "Final Cumulative Profit": st.column_config.NumberColumn(format=f"{new_currency}%.2f"),
+        "Net Present Value": st.column_config.NumberColumn(format=f"{new_currency}%.2f"),
+    })
+    st.markdown("### Cumulative Net Profits by Fleet Type")
+    generate_comparison_plot(comparison["chart_data"], new_currency,
+                             shared_cache, (comparison_key, "comparison", new_currency))
+    profiler.lap("comparison")
+
+# Rerun profile, written to the JSON lines log and optionally shown in the sidebar
+profile = profiler.finish(fleet_type=fleet_type, currency=new_currency, shared_cache=shared_cache.stats())
+if show_profile:
+    st.sidebar.metric(label="Rerun Time", value=f"{profile['total_ms']:.1f} ms")
+    st.sidebar.dataframe(pd.DataFrame({"Stage": list(profile["stages_ms"]), "Time (ms)": list(profile["stages_ms"].values())}),
+                         hide_index=True, use_container_width=True)
+    st.sidebar.markdown("##### Counters")
+    st.sidebar.json({**profile["counters"], "chart_spec_bytes": profile["chart_spec_bytes"], "caches": profile["caches"]})
+    st.sidebar.markdown("##### Shared cache")
+    st.sidebar.json(profile["shared_cache"])
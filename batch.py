@@ -0,0 +1,157 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from model import DEFAULT_FLEET_INPUTS, DEFAULT_INPUTS, DEFAULT_OPERATIONAL_YEARS, FLEET_TYPES, MODEL_FIELDS, compare_scenarios
+
+# Headless pricing of a whole fleet portfolio. The input file has one row per
+# fleet with columns named like st.session_state.inputs plus fleet_type, the
+# vehicle counts, daily km, work hours/days and downtime; missing columns and
+# empty cells fall back to the page defaults, any other column (e.g. a fleet
+# id) is copied through to the output, as text when the input is a CSV. Usage:
+#
+#   python batch.py fleets.csv priced.parquet --years 5 --workers 8
+#
+# The file is streamed in chunks and at most two chunks per worker are in
+# flight, so memory stays bounded however large the input is. Workers hand
+# back chunks ready to write (Arrow tables, or CSV text for a CSV output), so
+# the parent process only reads the input and writes the output.
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+# Function to stream a CSV or Parquet file as DataFrame chunks
+def read_chunks(path, chunk_size):
+    if path.endswith(".parquet"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        # Columns copied through are read as text: inferred per chunk, a column that is empty in the
+        # first chunk and has text later would not fit the output schema set by the first chunk
+        header = pd.read_csv(path, nrows=0).columns
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype={name: "string" for name in header if name not in MODEL_FIELDS})
+
+
+# Function to price one chunk of fleets and return the per-fleet results
+def price_chunk(frame, operational_years):
+    defaults = {**DEFAULT_INPUTS, **DEFAULT_FLEET_INPUTS, "fleet_type": FLEET_TYPES[0]}
+    params = {}
+    for key in MODEL_FIELDS:
+        if key in frame:
+            params[key] = frame[key].fillna(defaults[key]).to_numpy()
+    baseline, coulomb = compare_scenarios(params, operational_years)
+
+    columns = {}
+    for prefix, result in (("", baseline), ("coulomb_", coulomb)):
+        columns[f"{prefix}init_cost"] = result["init_cost"]
+        columns[f"{prefix}annual_revenue"] = result["annual_revenue"]
+        columns[f"{prefix}annual_cost"] = result["annual_cost"]
+        columns[f"{prefix}total_cost"] = result["total_cost"]
+        columns[f"{prefix}roi"] = result["roi"]
+        columns[f"{prefix}payback_period"] = result["payback_period"]
+        columns[f"{prefix}fleet_utilization"] = result["fleet_utilization"]
+    columns["cost_savings"] = baseline["total_cost"] - coulomb["total_cost"]
+    for prefix, result in (("", baseline), ("coulomb_", coulomb)):
+        for year in range(operational_years + 1):
+            columns[f"{prefix}cumulative_profit_y{year}"] = result["profits"][:, year]
+
+    passthrough = frame[[name for name in frame.columns if name not in MODEL_FIELDS]].reset_index(drop=True)
+    return pd.concat([passthrough, pd.DataFrame(columns)], axis=1)
+
+
+# Function to price one chunk in a worker and encode it for the output: CSV text (the header apart)
+# for a CSV output, a pa.Table otherwise, as Parquet row groups cannot be joined without re-encoding
+def encode_chunk(frame, operational_years, csv_output=False):
+    table = pa.Table.from_pandas(price_chunk(frame, operational_years), preserve_index=False)
+    if not csv_output:
+        return table
+    header, text = pa.BufferOutputStream(), pa.BufferOutputStream()
+    pa_csv.write_csv(table.schema.empty_table(), header)
+    pa_csv.write_csv(table, text, pa_csv.WriteOptions(include_header=False))
+    return {"header": header.getvalue().to_pybytes(), "text": text.getvalue().to_pybytes(), "rows": len(table)}
+
+
+# Writes result chunks to a CSV or Parquet file as they arrive
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._schema = None
+        self._writer = None
+
+    # Write a DataFrame, a pa.Table or CSV text from encode_chunk
+    def write(self, frame):
+        if isinstance(frame, dict):
+            self._write_text(frame)
+            return
+        table = frame if isinstance(frame, pa.Table) else pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            # pyarrow's CSV writer is an order of magnitude faster than DataFrame.to_csv
+            writer_class = pq.ParquetWriter if self.path.endswith(".parquet") else pa_csv.CSVWriter
+            self._schema = table.schema
+            self._writer = writer_class(self.path, self._schema)
+        self._writer.write_table(table.cast(self._schema))
+        self.rows += len(table)
+
+    def _write_text(self, encoded):
+        if self._writer is None:
+            self._writer = open(self.path, "wb")
+            self._writer.write(encoded["header"])
+        self._writer.write(encoded["text"])
+        self.rows += encoded["rows"]
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+# Function to price every fleet in input_path and write the results to output_path
+def price_file(input_path, output_path, operational_years=DEFAULT_OPERATIONAL_YEARS,
+               chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    workers = workers or os.cpu_count() or 1
+    csv_output = not output_path.endswith(".parquet")
+    writer = ChunkWriter(output_path)
+    try:
+        if workers == 1:
+            for chunk in read_chunks(input_path, chunk_size):
+                writer.write(encode_chunk(chunk, operational_years, csv_output))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Results are written in input order; waiting on the oldest chunk bounds memory
+                pending = deque()
+                for chunk in read_chunks(input_path, chunk_size):
+                    pending.append(pool.submit(encode_chunk, chunk, operational_years, csv_output))
+                    if len(pending) >= 2 * workers:
+                        writer.write(pending.popleft().result())
+                while pending:
+                    writer.write(pending.popleft().result())
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a fleet portfolio without and with Coulomb.")
+    parser.add_argument("input", help="CSV or Parquet file with one row per fleet")
+    parser.add_argument("output", help="CSV or Parquet file for the per-fleet results")
+    parser.add_argument("--years", type=int, default=DEFAULT_OPERATIONAL_YEARS, help="Years of operation")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows priced per task")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+    if args.years < 1:
+        parser.error("--years must be at least 1")
+
+    start = time.perf_counter()
+    rows = price_file(args.input, args.output, args.years, args.chunk_size, args.workers)
+    print(f"Priced {rows:,} fleets in {time.perf_counter() - start:.2f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
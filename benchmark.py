@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from generate_plot import build_comparison_plot_spec, build_cost_breakdown_plot_spec, build_plot_spec
+from model import DEFAULT_FLEET_INPUTS, DEFAULT_INPUTS, FLEET_TYPES, get_annual_cost, get_annual_revenue, price_scenarios
+from projection import COST_CATEGORIES, compare_fleet_types, project
+
+# Benchmarks for the model, the chart specs and whole-page reruns. Usage:
+#
+#   python benchmark.py run --label before-change
+#   python benchmark.py run --layers model charts
+#   python benchmark.py compare --threshold 0.15
+#
+# Each run appends one JSON line to the history file (default
+# benchmarks.jsonl) with the median and minimum time of every case. compare
+# checks the latest run against an earlier one (the previous run by default,
+# or the latest run with a given label) and exits with status 1 if any case
+# got slower than the threshold. Everything runs offline; the app layer uses
+# Streamlit's headless AppTest harness instead of a server.
+
+LAYERS = ("model", "charts", "app")
+DEFAULT_HISTORY = "benchmarks.jsonl"
+DEFAULT_THRESHOLD = 0.2
+SCENARIO_ROWS = (1, 1000, 100000)
+# Monthly projections hold every cost line per period, so they stop at fewer rows
+PROJECTION_ROWS = (1, 1000, 10000)
+HORIZONS = (5, 30)
+CHART_HORIZONS = (5, 30, 100)
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai.py")
+
+
+# Function to time a callable; returns the median and minimum milliseconds per call.
+# Fast calls are looped so each timed repeat lasts at least min_seconds.
+def measure(func, repeat=5, min_seconds=0.05):
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or number >= 1_000_000:
+            break
+        number *= 10
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000, "calls": number * repeat}
+
+
+# Function to summarise timings that were taken one at a time (whole reruns)
+def summarize_times(times):
+    return {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000, "calls": len(times)}
+
+
+# Function to build a scenario column set of the given size, with varied fleet types and counts
+def scenario_batch(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "fleet_type": np.array(FLEET_TYPES)[np.arange(rows) % len(FLEET_TYPES)],
+        "num_vans_2w": rng.integers(0, 50, rows),
+        "num_vans_3w": rng.integers(1, 50, rows),
+        "daily_average_km_2w": rng.uniform(40, 120, rows),
+        "daily_average_km_3w": rng.uniform(60, 150, rows),
+    }
+
+
+def model_benchmarks(repeat):
+    inputs = {**DEFAULT_INPUTS, **DEFAULT_FLEET_INPUTS}
+    results = {}
+
+    # The scalar formulas, called once per scenario as the original page did
+    def scalar():
+        revenue = get_annual_revenue(inputs["battery_issues"], inputs["software_issues"], inputs["num_vans_2w"],
+                                     inputs["num_vans_3w"], inputs["rev_km"], inputs["work_days"],
+                                     inputs["daily_average_km_2w"], inputs["daily_average_km_3w"])
+        get_annual_cost(inputs["daily_average_km_2w"], inputs["num_vans_2w"], inputs["daily_average_km_3w"],
+                        inputs["num_vans_3w"], inputs["electricity_cost_per_km"], inputs["work_hours"], inputs["work_days"],
+                        inputs["annual_maintenance_cost"], inputs["battery_replacement_cost_2w"],
+                        inputs["battery_replacement_cost_3w"], inputs["driver_wage_2w"], inputs["driver_wage_3w"],
+                        inputs["battery_issues"], inputs["software_issues"], revenue, 0.0,
+                        inputs["basic_insurance_2w"], inputs["basic_insurance_3w"])
+
+    results["model/scalar_revenue_and_cost"] = measure(scalar, repeat)
+    for rows in SCENARIO_ROWS:
+        batch = scenario_batch(rows)
+        for years in HORIZONS:
+            results[f"model/price_scenarios/rows={rows}/years={years}"] = measure(
+                lambda: price_scenarios(batch, years, coulomb=True), repeat)
+            if rows in PROJECTION_ROWS:
+                results[f"model/project_monthly/rows={rows}/years={years}"] = measure(
+                    lambda: project(batch, years, coulomb=True, periods_per_year=12,
+                                    wage_inflation=0.05, electricity_inflation=0.04, battery_fade=0.03), repeat)
+    return results
+
+
+def chart_benchmarks(repeat):
+    scenario = {**DEFAULT_INPUTS, **DEFAULT_FLEET_INPUTS}
+    results = {}
+    for years in CHART_HORIZONS:
+        result = project(scenario, years)
+        profits_data = pd.DataFrame({
+            "Year": result["years"],
+            "Revenue": result["revenues"][0],
+            "Cost": result["costs"][0],
+            "Cumulative Profit": result["profits"][0],
+        })
+        breakdown_data = pd.DataFrame({
+            "Year": result["years"][1:],
+            **{label: result["cost_breakdown"][key][0, 1:] for key, label in COST_CATEGORIES.items() if key != "initial"},
+        })
+        baseline, coulomb = compare_fleet_types(scenario, years)
+        comparison_data = pd.concat([
+            pd.DataFrame({
+                "Fleet Type": fleet,
+                "Scenario": label,
+                "Year": compared["years"],
+                "Revenue": compared["revenues"][index],
+                "Cost": compared["costs"][index],
+                "Cumulative Profit": compared["profits"][index],
+            })
+            for index, fleet in enumerate(FLEET_TYPES)
+            for label, compared in (("Without Coulomb", baseline), ("With Coulomb", coulomb))
+        ], ignore_index=True)
+        results[f"charts/profit_plot/years={years}"] = measure(lambda: build_plot_spec(profits_data, 1.5, "₹"), repeat)
+        results[f"charts/cost_breakdown/years={years}"] = measure(lambda: build_cost_breakdown_plot_spec(breakdown_data, "₹"), repeat)
+        results[f"charts/comparison/years={years}"] = measure(lambda: build_comparison_plot_spec(comparison_data, "₹"), repeat)
+    return results
+
+
+# Function to find a widget of the given kind by its label
+def widget(app, kind, label):
+    for element in getattr(app, kind):
+        if element.label == label:
+            return element
+    raise LookupError(f"No {kind} labelled {label!r}")
+
+
+# Widget-change sequences replayed against a running page; each step is one rerun.
+# Steps marked submit change an input inside the input form and press its Apply button.
+INTERACTIONS = {
+    "fleet_type": [("radio", "Type of fleet", fleet, False) for fleet in FLEET_TYPES[1:] + FLEET_TYPES[:1]],
+    "edit_inputs": [("number_input", "Number of Vans - 3W", count, True) for count in (2, 5, 10)]
+                   + [("number_input", "Revenue per km", 20.0, True)],
+    "currency": [("selectbox", "What kind of currency unit?", currency, False) for currency in ("$", "₹")],
+    "coulomb_toggle": [("toggle", "Using Coulomb", value, False) for value in (False, True)],
+    "years": [("number_input", "Years of operation", years, False) for years in (10, 30, 5)],
+}
+
+
+# Function to open a new session of the page with cold caches. st.cache_data and st.cache_resource
+# outlive an AppTest, so without clearing them every repeat after the first would time cache hits.
+def fresh_app():
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    return AppTest.from_file(APP_PATH, default_timeout=60)
+
+
+def app_benchmarks(repeat):
+    # The page opens a scenario store; keep it out of the working directory
+    previous_store = os.environ.get("COULOMB_STORE")
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["COULOMB_STORE"] = os.path.join(directory, "scenarios.db")
+        try:
+            return run_app_benchmarks(repeat)
+        finally:
+            if previous_store is None:
+                os.environ.pop("COULOMB_STORE")
+            else:
+                os.environ["COULOMB_STORE"] = previous_store
+
+
+def run_app_benchmarks(repeat):
+    results = {}
+
+    # A fresh session per fleet type: the first run, then a rerun with nothing changed
+    for fleet in FLEET_TYPES:
+        first_runs, reruns = [], []
+        for _ in range(repeat):
+            app = fresh_app()
+            start = time.perf_counter()
+            app.run()
+            first_runs.append(time.perf_counter() - start)
+            widget(app, "radio", "Type of fleet").set_value(fleet)
+            app.run()
+            start = time.perf_counter()
+            app.run()
+            reruns.append(time.perf_counter() - start)
+            if app.exception:
+                raise RuntimeError(f"ai.py raised: {app.exception[0].message}")
+        name = fleet.split()[0].lower()
+        results[f"app/first_run/{name}"] = summarize_times(first_runs)
+        results[f"app/unchanged_rerun/{name}"] = summarize_times(reruns)
+
+    for name, steps in INTERACTIONS.items():
+        times = []
+        for _ in range(repeat):
+            app = fresh_app()
+            app.run()
+            for kind, label, value, submit in steps:
+                widget(app, kind, label).set_value(value)
+                if submit:
+                    widget(app, "button", "Apply").click()
+                start = time.perf_counter()
+                app.run()
+                times.append(time.perf_counter() - start)
+            if app.exception:
+                raise RuntimeError(f"ai.py raised during {name}: {app.exception[0].message}")
+        results[f"app/interaction/{name}"] = summarize_times(times)
+    return results
+
+
+BENCHMARKS = {"model": model_benchmarks, "charts": chart_benchmarks, "app": app_benchmarks}
+
+
+# Function to get the current commit, if this is a git checkout
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(APP_PATH)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(layers, repeat, history_path, label=None):
+    results = {}
+    for layer in layers:
+        print(f"Running {layer} benchmarks...", file=sys.stderr)
+        results.update(BENCHMARKS[layer](repeat))
+    record = {
+        "timestamp": time.time(),
+        "label": label,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "results": results,
+    }
+    with open(history_path, "a") as file:
+        file.write(json.dumps(record) + "\n")
+    for name, timing in results.items():
+        print(f"{name:<55} {timing['median_ms']:>12.4f} ms  (min {timing['min_ms']:.4f})")
+    return record
+
+
+def load_history(history_path):
+    with open(history_path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+# Function to compare two runs; returns one row per case they share
+def compare_runs(baseline, current, threshold=DEFAULT_THRESHOLD):
+    rows = []
+    for name, timing in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["median_ms"]
+        after = timing["median_ms"]
+        change = after / before - 1 if before > 0 else 0.0
+        rows.append({"case": name, "baseline_ms": before, "current_ms": after, "change": change,
+                     "regression": change > threshold})
+    return rows
+
+
+def compare(history_path, baseline_label=None, threshold=DEFAULT_THRESHOLD):
+    history = load_history(history_path)
+    if len(history) < 2:
+        raise SystemExit(f"{history_path} needs at least two runs to compare")
+    current = history[-1]
+    if baseline_label is None:
+        baseline = history[-2]
+    else:
+        matches = [record for record in history[:-1] if record.get("label") == baseline_label]
+        if not matches:
+            raise SystemExit(f"No earlier run labelled {baseline_label!r} in {history_path}")
+        baseline = matches[-1]
+
+    rows = compare_runs(baseline, current, threshold)
+    print(f"Baseline: {baseline.get('label') or baseline.get('commit')}  Current: {current.get('label') or current.get('commit')}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<55} {row['baseline_ms']:>12.4f} -> {row['current_ms']:>12.4f} ms {row['change']:>+8.1%}{flag}")
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"{len(regressions)} case(s) slower by more than {threshold:.0%}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the model, chart building and page reruns.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Run benchmarks and append the results to the history")
+    run_parser.add_argument("--layers", nargs="+", choices=LAYERS, default=list(LAYERS), help="Layers to benchmark")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Timed repeats per case")
+    run_parser.add_argument("--label", default=None, help="Name for this run, to compare against later")
+    run_parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON lines history file")
+    compare_parser = subparsers.add_parser("compare", help="Compare the latest run with an earlier one")
+    compare_parser.add_argument("--baseline", default=None, help="Label of the run to compare against (default: the previous run)")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slowdown that counts as a regression")
+    compare_parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON lines history file")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args.layers, args.repeat, args.history, args.label)
+        return 0
+    return compare(args.history, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Small caching helpers for the Streamlit reruns: a canonical, hashable key for
+# a scenario, a bounded LRU cache with hit/miss counters, and a thread-safe
+# cache shared by every session of the server process, bounded by memory and
+# entry age.
+
+# Floats are rounded to this many significant digits so values that went
+# through a currency round trip (x / 82 * 82) still produce the same key
+KEY_DIGITS = 10
+
+
+# Function to turn nested inputs into a canonical, hashable key
+def canonical_key(value):
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), canonical_key(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(canonical_key(item) for item in value)
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return float(value)
+    if isinstance(value, (float, np.floating)):
+        return float(f"{float(value):.{KEY_DIGITS}g}")
+    return value
+
+
+class LRUCache:
+    def __init__(self, max_entries=64):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # Function to return the cached value or compute and store it
+    def get_or_compute(self, key, compute):
+        if key in self._entries:
+            return self.get(key)
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Function to estimate how many bytes a cached value holds (arrays, DataFrames and the containers around them)
+def estimate_size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(index=True, deep=True)))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+_MISSING = object()
+
+
+class SharedCache:
+    # Streamlit runs every session on its own thread, so all access goes through one lock.
+    # Entries are evicted least recently used first once max_bytes is exceeded, and
+    # expire ttl seconds after they were stored. Cached values are shared between
+    # sessions and must not be modified.
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=3600.0):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bytes = 0
+        # key -> (value, size, stored_at)
+        self._entries = OrderedDict()
+        # Keys being computed, so concurrent sessions asking for the same key compute it once
+        self._computing = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._fresh(key) is not _MISSING
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    # Function to get an entry that has not expired, dropping it if it has; caller holds the lock
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+            self._remove(key)
+            self.expirations += 1
+            return _MISSING
+        return entry[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._fresh(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # A value bigger than the whole cache is not kept
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    # Function to return the cached value or compute and store it. Sessions asking for a
+    # key that another session is computing wait for that result instead of repeating it.
+    def get_or_compute(self, key, compute):
+        while True:
+            with self._lock:
+                value = self._fresh(key)
+                if value is not _MISSING:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+                computing = self._computing.get(key)
+                if computing is None:
+                    self.misses += 1
+                    self._computing[key] = threading.Event()
+                    break
+            # If that computation fails, the next loop computes the value here
+            computing.wait()
+        try:
+            value = compute()
+            self.put(key, value)
+        finally:
+            with self._lock:
+                self._computing.pop(key).set()
+        return value
+
+    # Function to drop every expired entry
+    def expire(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._fresh(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "memory_used": self.bytes / self.max_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "ttl": self.ttl,
+            }
@@ -1,12 +1,42 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+import numpy as np
+from profiling import current_profiler
 
-def generate_plot(profits_data, payback_period, units):
+# Name of the dataset of charts whose data is kept out of the spec
+CHART_DATA = "chart_data"
+
+
+# Function to display a chart spec, building it only when the cache does not have it.
+# Charts that can outgrow Altair's 5000 inlined rows build a (data, spec) pair instead,
+# with the spec reading the CHART_DATA dataset; Streamlit sends that data as Arrow.
+# Data that is cached elsewhere can be given as `data`, so only the spec is cached here.
+def show_chart(build_spec, spec_cache=None, cache_key=None, data=None):
+    profiler = current_profiler()
+    with profiler.stage("chart_spec"):
+        if spec_cache is None or cache_key is None:
+            built = build_spec()
+        else:
+            built = spec_cache.get_or_compute(cache_key, build_spec)
+    data, spec = built if isinstance(built, tuple) else (data, built)
+    profiler.record_chart_spec(spec)
+    if data is not None:
+        spec = {**spec, "datasets": {**spec.get("datasets", {}), CHART_DATA: data}}
+    with profiler.stage("chart_render"):
+        st.vega_lite_chart(spec, use_container_width=True)
+
+
+def generate_plot(profits_data, payback_period, units, spec_cache=None, cache_key=None):
+    show_chart(lambda: build_plot_spec(profits_data, payback_period, units), spec_cache, cache_key)
+
+
+def build_plot_spec(profits_data, payback_period, units):
     melted_data = profits_data.melt(id_vars=["Year"], var_name="Metric", value_name="Value")
+    current_profiler().count("dataframes", 3 if payback_period else 1)
 
-    # Create base chart
-    base = alt.Chart(melted_data).encode(
+    # Create base chart; weekly periods over many years pass Altair's inline row limit
+    base = alt.Chart(alt.NamedData(CHART_DATA)).encode(
         x=alt.X(
             "Year:Q",
             scale=alt.Scale(domain=(0, profits_data["Year"].max())),
@@ -63,5 +93,231 @@ def generate_plot(profits_data, payback_period, units):
         # Combine charts
         final_chart = lines + payback_point
 
-    # Display the chart in Streamlit
-    st.altair_chart(final_chart, use_container_width=True)
\ No newline at end of file
+    # Serialized Vega-Lite spec, so it can be cached between reruns
+    return melted_data, final_chart.to_dict()
+
+
+def generate_band_plot(years, profit_bands, units, spec_cache=None, cache_key=None):
+    show_chart(lambda: build_band_plot_spec(years, profit_bands, units), spec_cache, cache_key)
+
+
+def build_band_plot_spec(years, profit_bands, units):
+    current_profiler().count("dataframes")
+    bands_data = pd.DataFrame({
+        "Year": years,
+        "P10": profit_bands[0],
+        "P50": profit_bands[1],
+        "P90": profit_bands[2],
+    })
+
+    base = alt.Chart(bands_data).encode(
+        x=alt.X(
+            "Year:Q",
+            scale=alt.Scale(domain=(0, bands_data["Year"].max())),
+            axis=alt.Axis(title="Year", grid=True, tickCount=6),
+        )
+    ).properties(
+        width=700,
+        height=400,
+        title="Cumulative Profit (P10 / P50 / P90)"
+    )
+
+    # Shaded P10-P90 band with the median on top
+    band = base.mark_area(opacity=0.3, color="#9d9fff").encode(
+        y=alt.Y("P10:Q", axis=alt.Axis(title=f"Cumulative Profit ({units})", grid=True)),
+        y2="P90:Q",
+        tooltip=["Year:Q", "P10:Q", "P50:Q", "P90:Q"],
+    )
+    median = base.mark_line(color="#6d72f6").encode(y="P50:Q")
+
+    return (band + median).to_dict()
+
+
+def generate_payback_histogram(payback_samples, bins=40, spec_cache=None, cache_key=None):
+    show_chart(lambda: build_payback_histogram_spec(payback_samples, bins), spec_cache, cache_key)
+
+
+def build_payback_histogram_spec(payback_samples, bins=40):
+    # Bin before plotting so the chart only carries one row per bar
+    labels = list(payback_samples)
+    finite = np.concatenate([np.asarray(payback_samples[label])[~np.isnan(payback_samples[label])] for label in labels])
+    edges = np.histogram_bin_edges(finite, bins=bins) if finite.size else np.linspace(0, 1, bins + 1)
+    frames = []
+    for label in labels:
+        samples = np.asarray(payback_samples[label])
+        counts, _ = np.histogram(samples[~np.isnan(samples)], bins=edges)
+        frames.append(pd.DataFrame({
+            "Scenario": label,
+            "Start": edges[:-1],
+            "End": edges[1:],
+            "Share": counts / len(samples),
+        }))
+    histogram_data = pd.concat(frames, ignore_index=True)
+    current_profiler().count("dataframes", len(frames) + 1)
+
+    chart = alt.Chart(histogram_data).mark_bar(opacity=0.6).encode(
+        x=alt.X("Start:Q", axis=alt.Axis(title="Payback Period (Years)", grid=True)),
+        x2="End:Q",
+        y=alt.Y("Share:Q", axis=alt.Axis(title="Share of samples", format="%"), stack=None),
+        color=alt.Color(
+            "Scenario:N",
+            scale=alt.Scale(range=["#f3d94e", "#47fff4"]),
+            title="Scenario",
+        ),
+        tooltip=["Scenario:N", "Start:Q", "End:Q", alt.Tooltip("Share:Q", format=".1%")],
+    ).properties(
+        width=700,
+        height=300,
+        title="Distribution of Payback Periods"
+    )
+
+    return chart.to_dict()
+
+
+def generate_tornado_plot(tornado_data, metric_title, spec_cache=None, cache_key=None):
+    show_chart(lambda: build_tornado_plot_spec(tornado_data, metric_title), spec_cache, cache_key)
+
+
+def build_tornado_plot_spec(tornado_data, metric_title):
+    # Bars show how far the metric moves from its base value when an input goes down or up
+    changes = pd.DataFrame({
+        "Input": tornado_data["Input"],
+        "Decrease": tornado_data["Low"] - tornado_data["Base"],
+        "Increase": tornado_data["High"] - tornado_data["Base"],
+    }).melt(id_vars=["Input"], var_name="Case", value_name="Change")
+    current_profiler().count("dataframes", 2)
+
+    chart = alt.Chart(changes).mark_bar().encode(
+        y=alt.Y("Input:N", sort=list(tornado_data["Input"]), title=None),
+        x=alt.X("Change:Q", axis=alt.Axis(title=f"Change in {metric_title}", grid=True)),
+        color=alt.Color(
+            "Case:N",
+            scale=alt.Scale(domain=["Decrease", "Increase"], range=["#f3d94e", "#6d72f6"]),
+            title="Input",
+        ),
+        tooltip=["Input:N", "Case:N", "Change:Q"],
+    ).properties(
+        width=700,
+        height=alt.Step(22),
+        title=f"Sensitivity of {metric_title}"
+    )
+    return chart.to_dict()
+
+
+def generate_heatmap(grid_data, x_step, y_step, x_title, y_title, value_title, scheme="viridis", spec_cache=None, cache_key=None):
+    # The grid can hold 250k cells, so it goes to the frontend as Arrow data instead of being inlined in the spec
+    show_chart(lambda: build_heatmap_spec(x_step, y_step, x_title, y_title, value_title, scheme), spec_cache, cache_key, grid_data)
+
+
+def build_heatmap_spec(x_step, y_step, x_title, y_title, value_title, scheme="viridis"):
+    # Only the cell centres are sent; the cell edges are worked out in the browser
+    chart = alt.Chart(alt.NamedData(CHART_DATA)).transform_calculate(
+        x_low=f"datum.x - {x_step / 2!r}",
+        x_high=f"datum.x + {x_step / 2!r}",
+        y_low=f"datum.y - {y_step / 2!r}",
+        y_high=f"datum.y + {y_step / 2!r}",
+    ).mark_rect().encode(
+        x=alt.X("x_low:Q", scale=alt.Scale(zero=False, nice=False), axis=alt.Axis(title=x_title)),
+        x2="x_high:Q",
+        y=alt.Y("y_low:Q", scale=alt.Scale(zero=False, nice=False), axis=alt.Axis(title=y_title)),
+        y2="y_high:Q",
+        color=alt.Color("value:Q", scale=alt.Scale(scheme=scheme), title=value_title),
+        tooltip=[alt.Tooltip("value:Q", title=value_title)],
+    ).properties(
+        width=700,
+        height=500,
+        title=f"{value_title}: {x_title} x {y_title}"
+    )
+    return chart.to_dict()
+
+
+def generate_pareto_plot(front_data, objective_title, units, spec_cache=None, cache_key=None):
+    show_chart(lambda: build_pareto_plot_spec(front_data, objective_title, units), spec_cache, cache_key)
+
+
+def build_pareto_plot_spec(front_data, objective_title, units):
+    chart = alt.Chart(front_data).mark_line(point=True).encode(
+        x=alt.X("capital:Q", axis=alt.Axis(title=f"Capital ({units})", grid=True)),
+        y=alt.Y("objective:Q", axis=alt.Axis(title=objective_title, grid=True)),
+        color=alt.Color(
+            "Scenario:N",
+            scale=alt.Scale(domain=["Without Coulomb", "With Coulomb"], range=["#f3d94e", "#47fff4"]),
+            title="Scenario",
+        ),
+        tooltip=["Scenario:N", "num_vans_2w:Q", "num_vans_3w:Q", "daily_average_km_2w:Q",
+                 "daily_average_km_3w:Q", "capital:Q", "objective:Q"],
+    ).properties(
+        width=700,
+        height=400,
+        title=f"Pareto Front: Capital vs {objective_title}"
+    )
+    return chart.to_dict()
+
+
+def generate_cost_breakdown_plot(breakdown_data, units, spec_cache=None, cache_key=None):
+    show_chart(lambda: build_cost_breakdown_plot_spec(breakdown_data, units), spec_cache, cache_key)
+
+
+def build_cost_breakdown_plot_spec(breakdown_data, units):
+    melted_data = breakdown_data.melt(id_vars=["Year"], var_name="Category", value_name="Cost")
+    melted_data = melted_data[melted_data.groupby("Category")["Cost"].transform("any")]
+    current_profiler().count("dataframes", 2)
+
+    # Weekly periods over many years give more rows than Altair inlines, so the data is kept apart
+    chart = alt.Chart(alt.NamedData(CHART_DATA)).mark_area().encode(
+        x=alt.X(
+            "Year:Q",
+            scale=alt.Scale(domain=(0, breakdown_data["Year"].max())),
+            axis=alt.Axis(title="Year", grid=True, tickCount=6),
+        ),
+        y=alt.Y("Cost:Q", stack="zero", axis=alt.Axis(title=f"Cost per period ({units})", grid=True)),
+        color=alt.Color("Category:N", title="Category"),
+        tooltip=["Year:Q", "Category:N", "Cost:Q"],
+    ).properties(
+        width=700,
+        height=400,
+        title="Operating Cost by Category"
+    )
+    return melted_data, chart.to_dict()
+
+
+def generate_comparison_plot(comparison_data, units, spec_cache=None, cache_key=None):
+    show_chart(lambda: build_comparison_plot_spec(comparison_data, units), spec_cache, cache_key)
+
+
+def build_comparison_plot_spec(comparison_data, units):
+    melted_data = comparison_data.melt(id_vars=["Fleet Type", "Scenario", "Year"], var_name="Metric", value_name="Value")
+    current_profiler().count("dataframes")
+
+    # One spec for every fleet type: a facet per fleet, Coulomb shown dashed.
+    # Monthly and weekly periods give more rows than Altair inlines, so the data is kept apart
+    chart = alt.Chart(alt.NamedData(CHART_DATA)).mark_line().encode(
+        x=alt.X(
+            "Year:Q",
+            scale=alt.Scale(domain=(0, comparison_data["Year"].max())),
+            axis=alt.Axis(title="Year", grid=True, tickCount=6),
+        ),
+        y=alt.Y("Value:Q", axis=alt.Axis(title=f"Value ({units})", grid=True)),
+        color=alt.Color(
+            "Metric:N",
+            scale=alt.Scale(
+                domain=["Revenue", "Cost", "Cumulative Profit"],
+                range=["#9d9fff", "#f3d94e", "#6d72f6"]
+            ),
+            title="Metric",
+        ),
+        strokeDash=alt.StrokeDash(
+            "Scenario:N",
+            scale=alt.Scale(domain=["Without Coulomb", "With Coulomb"], range=[[1, 0], [6, 3]]),
+            title="Scenario",
+        ),
+        tooltip=["Fleet Type:N", "Scenario:N", "Year:Q", "Metric:N", "Value:Q"],
+    ).properties(
+        width=250,
+        height=350,
+    ).facet(
+        column=alt.Column("Fleet Type:N", title=None),
+    ).properties(
+        title="Revenue, Cost, and Cumulative Profit by Fleet Type"
+    )
+    return melted_data, chart.to_dict()
@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+from benchmark import APP_PATH, INTERACTIONS, git_commit
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+# Load test for the Streamlit page. Starts `streamlit run ai.py` on a local
+# port, opens N websocket sessions at once (speaking the same protobuf
+# messages as the browser) and has every session replay the page
+# interactions: switching the fleet type, editing inputs and pressing Apply,
+# switching the currency and flipping "Using Coulomb". Usage:
+#
+#   python loadtest.py --users 1 5 10 25 --duration 30
+#
+# For each number of users it reports the p50/p95/p99 rerun latency (from
+# sending a change to the script finishing), reruns per second, the server's
+# CPU use and its peak resident memory, read from /proc. Nothing outside the
+# machine is contacted. Results can be appended to a JSON lines file.
+
+DEFAULT_USERS = (1, 5, 10, 25)
+DEFAULT_DURATION = 30.0
+DEFAULT_THINK_TIME = 0.5
+DEFAULT_PORT = 8599
+RERUN_TIMEOUT = 120.0
+STARTUP_TIMEOUT = 60.0
+RSS_SAMPLE_INTERVAL = 0.2
+USER_INTERACTIONS = ("fleet_type", "edit_inputs", "currency", "coulomb_toggle")
+# Element types of the widgets the interactions use, and how their values are sent
+WIDGET_ELEMENTS = {"radio": "radio", "selectbox": "selectbox", "number_input": "number_input", "toggle": "checkbox", "button": "button"}
+VALUE_FIELDS = {"radio": "string_value", "selectbox": "string_value", "number_input": "double_value", "checkbox": "bool_value", "button": "trigger_value"}
+FINISHED = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR}
+
+
+class RerunError(Exception):
+    pass
+
+
+# One simulated browser tab
+class Session:
+    def __init__(self, url):
+        self.url = url
+        self.page_script_hash = ""
+        # label -> (element type, widget id, fragment id) from the latest run
+        self.widgets = {}
+        # Values this user has set, sent with every rerun like the browser does
+        self.widget_states = {}
+        # Messages the server may replace with a reference to their hash
+        self.message_cache = {}
+        self.errors = 0
+
+    async def __aenter__(self):
+        self.connection = await connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=STARTUP_TIMEOUT)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.connection.close()
+
+    # Function to change widgets (label -> value) and wait for the rerun; returns its latency in seconds
+    async def rerun(self, changes=(), trigger=None):
+        fragment_ids = set()
+        for label, value in changes:
+            element, widget_id, fragment_id = self.widgets[label]
+            state = WidgetState(id=widget_id)
+            setattr(state, VALUE_FIELDS[element], value)
+            self.widget_states[widget_id] = state
+            fragment_ids.add(fragment_id)
+        states = list(self.widget_states.values())
+        if trigger is not None:
+            _, widget_id, fragment_id = self.widgets[trigger]
+            states.append(WidgetState(id=widget_id, trigger_value=True))
+            fragment_ids.add(fragment_id)
+
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.page_script_hash = self.page_script_hash
+        client_state.widget_states.widgets.extend(states)
+        client_state.cached_message_hashes.extend(self.message_cache)
+        # A change inside one fragment reruns only that fragment
+        if len(fragment_ids) == 1:
+            client_state.fragment_id = fragment_ids.pop()
+        start = time.perf_counter()
+        await self.connection.send(message.SerializeToString())
+        await asyncio.wait_for(self._read_run(client_state.fragment_id), RERUN_TIMEOUT)
+        return time.perf_counter() - start
+
+    async def _read_run(self, fragment_id):
+        seen = {}
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await self.connection.recv())
+            if message.WhichOneof("type") == "ref_hash":
+                message = self.message_cache[message.ref_hash]
+            elif message.metadata.cacheable:
+                self.message_cache[message.hash] = message
+            kind = message.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = message.new_session.main_script_hash
+            elif kind == "delta" and message.delta.WhichOneof("type") == "new_element":
+                self._read_element(message.delta, seen)
+            elif kind == "script_finished" and message.script_finished in FINISHED:
+                break
+        if fragment_id:
+            self.widgets.update(seen)
+        else:
+            self.widgets = seen
+            # Widgets that are gone no longer have a state to send
+            ids = {widget_id for _, widget_id, _ in seen.values()}
+            self.widget_states = {widget_id: state for widget_id, state in self.widget_states.items() if widget_id in ids}
+
+    def _read_element(self, delta, seen):
+        element = delta.new_element.WhichOneof("type")
+        if element == "exception":
+            self.errors += 1
+        elif element in VALUE_FIELDS:
+            proto = getattr(delta.new_element, element)
+            seen[proto.label] = (element, proto.id, delta.fragment_id)
+
+
+# Function to play one user: open the page, then replay interactions with a pause between changes until stop_at
+async def run_user(url, index, stop_at, think_time, latencies):
+    rng = random.Random(index)
+    async with Session(url) as session:
+        latencies["first_run"].append(await session.rerun())
+        # Users start at different interactions so the load is mixed
+        for round_index in range(index, sys.maxsize):
+            name = USER_INTERACTIONS[round_index % len(USER_INTERACTIONS)]
+            for kind, label, value, submit in INTERACTIONS[name]:
+                if time.perf_counter() >= stop_at:
+                    return session.errors
+                await asyncio.sleep(rng.uniform(0, 2 * think_time))
+                latencies[name].append(await session.rerun([(label, value)], "Apply" if submit else None))
+
+
+# Function to read the CPU seconds a process has used so far
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as file:
+        # The command name may hold spaces, so split after its closing parenthesis
+        fields = file.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+# Function to read a memory figure (VmRSS, VmHWM, ...) of a process in megabytes
+def memory_mb(pid, field="VmRSS"):
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def sample_rss(pid, peak):
+    while True:
+        peak[0] = max(peak[0], memory_mb(pid))
+        await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+
+def percentiles(times):
+    if not times:
+        return {"count": 0}
+    values = np.array(times) * 1000
+    return {"count": len(times), **{f"p{q}_ms": float(np.percentile(values, q)) for q in (50, 95, 99)}}
+
+
+# Function to run one load level: N users at once for duration seconds
+async def run_level(url, pid, users, duration, think_time):
+    latencies = {name: [] for name in ("first_run", *USER_INTERACTIONS)}
+    peak = [0.0]
+    sampler = asyncio.create_task(sample_rss(pid, peak))
+    cpu_before = cpu_seconds(pid)
+    start = time.perf_counter()
+    try:
+        outcomes = await asyncio.gather(
+            *(run_user(url, index, start + duration, think_time, latencies) for index in range(users)), return_exceptions=True)
+    finally:
+        elapsed = time.perf_counter() - start
+        cpu_used = cpu_seconds(pid) - cpu_before
+        sampler.cancel()
+    failed = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    reruns = [latency for name in USER_INTERACTIONS for latency in latencies[name]]
+    return {
+        "users": users,
+        "seconds": elapsed,
+        "reruns": len(reruns),
+        "reruns_per_second": len(reruns) / elapsed,
+        "latency": percentiles(reruns),
+        "by_interaction": {name: percentiles(times) for name, times in latencies.items()},
+        "script_errors": sum(outcome for outcome in outcomes if not isinstance(outcome, BaseException)),
+        "failed_sessions": len(failed),
+        "failures": sorted({f"{type(error).__name__}: {error}" for error in failed}),
+        "cpu_percent": cpu_used / elapsed * 100,
+        "peak_rss_mb": max(peak[0], memory_mb(pid)),
+    }
+
+
+# Function to start the app on a local port and wait until it answers its health check
+def start_server(app_path, port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app_path, "--server.headless=true", f"--server.port={port}",
+         "--server.address=127.0.0.1", "--browser.gatherUsageStats=false", "--server.runOnSave=false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"streamlit exited with status {process.returncode} before it started serving")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"streamlit did not start serving on port {port} within {STARTUP_TIMEOUT:.0f}s")
+
+
+def print_level(level):
+    latency = level["latency"]
+    print(f"{level['users']:>6} {level['reruns']:>8} {level['reruns_per_second']:>9.1f} "
+          f"{latency.get('p50_ms', float('nan')):>9.1f} {latency.get('p95_ms', float('nan')):>9.1f} "
+          f"{latency.get('p99_ms', float('nan')):>9.1f} {level['cpu_percent']:>7.0f}% {level['peak_rss_mb']:>10.1f} "
+          f"{level['script_errors'] + level['failed_sessions']:>7}", flush=True)
+    for failure in level["failures"]:
+        print(f"       session failed: {failure}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Streamlit page with concurrent simulated users.")
+    parser.add_argument("--users", type=int, nargs="+", default=list(DEFAULT_USERS), help="Concurrent users per load level")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds each load level runs")
+    parser.add_argument("--think-time", type=float, default=DEFAULT_THINK_TIME, help="Mean pause in seconds between a user's changes")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Local port for the app")
+    parser.add_argument("--app", default=APP_PATH, help="Streamlit script to load test")
+    parser.add_argument("--output", default=None, help="JSON lines file to append the results to")
+    args = parser.parse_args(argv)
+
+    process = start_server(args.app, args.port)
+    url = f"ws://127.0.0.1:{args.port}/_stcore/stream"
+    levels = []
+    try:
+        print(f"{'users':>6} {'reruns':>8} {'reruns/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu':>8} {'peak MB':>10} {'errors':>7}")
+        for users in args.users:
+            level = asyncio.run(run_level(url, process.pid, users, args.duration, args.think_time))
+            levels.append(level)
+            print_level(level)
+    finally:
+        process.terminate()
+        process.wait()
+    if args.output:
+        record = {
+            "timestamp": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "duration": args.duration,
+            "think_time": args.think_time,
+            "levels": levels,
+        }
+        with open(args.output, "a") as file:
+            file.write(json.dumps(record) + "\n")
+    return 1 if any(level["failed_sessions"] or level["script_errors"] for level in levels) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import numpy as np
+
+# Vectorized fleet model shared by the Streamlit page and the headless tools.
+# Every function works on scalars or on NumPy columns of equal length, so
+# many fleet scenarios can be priced in a single call.
+
+FLEET_TYPES = ("Captive Fleet", "Contracted Fleet", "DCO Fleet")
+
+# Default values for the inputs kept in st.session_state.inputs
+DEFAULT_INPUTS = {
+    "coulomb_partner_cost": 1800,
+    "vaqui_cost_ev2w": 80 * 1000,
+    "vaqui_cost_ev3w": 350 * 1000,
+    "gov_subsidy_ev2w": 15 * 1000,
+    "gov_subsidy_ev3w": 40 * 1000,
+    "state_incentive_ev2w": 0 * 1000,
+    "state_incentive_ev3w": 0 * 1000,
+    "contract_cost_ev2w": 1 * 1000,
+    "contract_cost_ev3w": 4 * 1000,
+    "platform_operational_cost": 0 * 1000,
+    "vehicle_inspection_cost": 0 * 1000,
+    "basic_insurance_2w": 5 * 1000,
+    "basic_insurance_3w": 15 * 1000,
+    "annual_maintenance_cost": 5 * 1000,
+    "battery_replacement_cost_2w": 0 * 1000,
+    "battery_replacement_cost_3w": 0 * 1000,
+    "electricity_cost_per_km": 0.90,
+    "rev_km": 30.0,
+    "driver_wage_2w": 87.0,
+    "driver_wage_3w": 100.0
+}
+
+# Default values for the fleet, work and downtime widgets
+DEFAULT_FLEET_INPUTS = {
+    "num_vans_2w": 0,
+    "num_vans_3w": 1,
+    "daily_average_km_2w": 65,
+    "daily_average_km_3w": 90,
+    "work_hours": 10,
+    "work_days": 300,
+    "battery_issues": 2,
+    "software_issues": 3,
+    "manager_ownership_factor": 0.8
+}
+DEFAULT_OPERATIONAL_YEARS = 5
+
+# Coulomb halves battery/software downtime and lowers maintenance/battery costs by 25%
+COULOMB_DOWNTIME_FACTOR = 0.5
+COULOMB_UPKEEP_FACTOR = 0.75
+
+# Hours a vehicle could work in a year (10 hours, 300 days)
+TOTAL_POSSIBLE_HOURS = 10 * 300
+
+MODEL_FIELDS = tuple(DEFAULT_INPUTS) + tuple(DEFAULT_FLEET_INPUTS) + ("fleet_type",)
+
+
+# Function to calculate annual revenue
+def annual_revenue(battery_issues, software_issues, num_vans_2w, num_vans_3w,
+                   rev_km, work_days, daily_average_km_2w, daily_average_km_3w):
+    missed_km_percentage = (battery_issues + software_issues) / 100 # Lost Revenue
+    daily_km_2w = daily_average_km_2w * num_vans_2w
+    daily_km_3w = daily_average_km_3w * num_vans_3w # Daily Revenue
+    return (daily_km_2w + daily_km_3w) * (1 - missed_km_percentage) * work_days * rev_km
+
+
+# Function to calculate annual cost, split by category
+def annual_cost_breakdown(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
+                          work_hours, work_days, annual_maintenance_cost, battery_replacement_cost_2w, battery_replacement_cost_3w,
+                          driver_wage_2w, driver_wage_3w, battery_issues, software_issues, annual_revenue, amortization_cost,
+                          basic_insurance_2w, basic_insurance_3w):
+    return {
+        "electricity": (daily_average_km_2w * num_vans_2w + daily_average_km_3w * num_vans_3w) * electricity_cost_per_km * work_days,
+        "maintenance": annual_maintenance_cost * (num_vans_2w + num_vans_3w),
+        "battery": battery_replacement_cost_2w * num_vans_2w + battery_replacement_cost_3w * num_vans_3w,
+        "driver": (driver_wage_2w * num_vans_2w + driver_wage_3w * num_vans_3w) * work_hours * work_days,
+        "downtime": (battery_issues + software_issues) / 100 * annual_revenue,
+        "amortization": amortization_cost,
+        "insurance": basic_insurance_2w * num_vans_2w + basic_insurance_3w * num_vans_3w,
+    }
+
+
+# Function to calculate annual cost
+def annual_cost(*args, **kwargs):
+    return sum(annual_cost_breakdown(*args, **kwargs).values())
+
+
+# Scalar wrappers kept for callers that price one scenario at a time
+def get_annual_revenue(battery_issues, software_issues, num_vans_2w, num_vans_3w,
+                       rev_km, work_days, daily_average_km_2w, daily_average_km_3w):
+    return float(annual_revenue(battery_issues, software_issues, num_vans_2w, num_vans_3w,
+                                rev_km, work_days, daily_average_km_2w, daily_average_km_3w))
+
+
+def get_annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
+                    work_hours, work_days, annual_maintenance_cost, battery_replacement_cost_2w, battery_replacement_cost_3w,
+                    driver_wage_2w, driver_wage_3w, battery_issues, software_issues, annual_revenue, amortization_cost,
+                    basic_insurance_2w, basic_insurance_3w):
+    return float(annual_cost(daily_average_km_2w, num_vans_2w, daily_average_km_3w, num_vans_3w, electricity_cost_per_km,
+                             work_hours, work_days, annual_maintenance_cost, battery_replacement_cost_2w, battery_replacement_cost_3w,
+                             driver_wage_2w, driver_wage_3w, battery_issues, software_issues, annual_revenue, amortization_cost,
+                             basic_insurance_2w, basic_insurance_3w))
+
+
+# Function to turn a mapping of scalars/columns into equal-length arrays, filling in defaults
+def scenario_columns(params):
+    columns = {**DEFAULT_INPUTS, **DEFAULT_FLEET_INPUTS, "fleet_type": FLEET_TYPES[0]}
+    columns.update({key: value for key, value in params.items() if key in columns})
+    arrays = {key: np.asarray(value) for key, value in columns.items()}
+    shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+    if len(shape) > 1:
+        raise ValueError(f"Scenario inputs must be scalars or 1-D columns, got shape {shape}")
+    size = shape[0] if shape else 1
+    columns = {}
+    for key, array in arrays.items():
+        # broadcast_to is slow next to the model itself for small batches, so full columns skip it
+        if array.shape != (size,):
+            array = np.broadcast_to(array, (size,))
+        columns[key] = array if key == "fleet_type" else array.astype(float)
+    unknown = set(np.unique(columns["fleet_type"])) - set(FLEET_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown fleet type(s): {', '.join(sorted(map(str, unknown)))}")
+    return columns
+
+
+# Function to build the year-by-year revenue, cost and cumulative profit arrays
+def yearly_projection(init_cost, annual_revenue, annual_cost, operational_years):
+    years = np.arange(operational_years + 1)
+    revenues = np.where(years > 0, np.asarray(annual_revenue, dtype=float)[:, None], 0.0)
+    costs = np.where(years > 0, np.asarray(annual_cost, dtype=float)[:, None], np.asarray(init_cost, dtype=float)[:, None])
+    profits = np.cumsum(revenues - costs, axis=1)
+    return revenues, costs, profits
+
+
+# Function to find the interpolated point where cumulative profit turns positive.
+# Rows that never break even get NaN. If profit crosses zero more than once the
+# last crossing wins, as in the original year-by-year loop.
+def payback_period(profits, period_length=1.0):
+    previous = profits[:, :-1]
+    current = profits[:, 1:]
+    crossed = (previous < 0) & (current > 0)
+    found = crossed.any(axis=1)
+    last = crossed.shape[1] - 1 - np.argmax(crossed[:, ::-1], axis=1)
+    previous = np.take_along_axis(previous, last[:, None], axis=1)[:, 0]
+    current = np.take_along_axis(current, last[:, None], axis=1)[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        period = last - previous / (current - previous)
+    return np.where(found, period * period_length, np.nan)
+
+
+# Function to calculate ROI (%) from cumulative profit and total cost
+def return_on_investment(final_profit, total_cost):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total_cost > 0, final_profit / total_cost * 100, 0.0)
+
+
+# Function to work out the per-scenario terms shared by the yearly and per-period projections:
+# the input columns plus the Coulomb factors, initial cost and the fixed yearly costs
+def scenario_terms(params, operational_years, coulomb=False):
+    terms = scenario_columns(params)
+    size = len(terms["fleet_type"])
+    captive = terms["fleet_type"] == "Captive Fleet"
+    contracted = terms["fleet_type"] == "Contracted Fleet"
+    coulomb = np.broadcast_to(np.asarray(coulomb, dtype=bool), (size,))
+    num_vans = terms["num_vans_2w"] + terms["num_vans_3w"]
+
+    # Cost of new vehicles, or a year of contract for contracted fleets (Initial Costs)
+    on_road_price_ev2w = np.where(contracted, terms["contract_cost_ev2w"] * 12,
+                                  terms["vaqui_cost_ev2w"] - terms["gov_subsidy_ev2w"] - terms["state_incentive_ev2w"])
+    on_road_price_ev3w = np.where(contracted, terms["contract_cost_ev3w"] * 12,
+                                  terms["vaqui_cost_ev3w"] - terms["gov_subsidy_ev3w"] - terms["state_incentive_ev3w"])
+    init_cost = on_road_price_ev2w * terms["num_vans_2w"] + on_road_price_ev3w * terms["num_vans_3w"]
+
+    terms.update({
+        "coulomb": coulomb,
+        "downtime_factor": np.where(coulomb, COULOMB_DOWNTIME_FACTOR, 1.0),
+        "upkeep_factor": np.where(coulomb, COULOMB_UPKEEP_FACTOR, 1.0),
+        "init_cost": init_cost,
+        # A captive fleet manager keeps their ownership share of the revenue
+        "revenue_share": np.where(captive, terms["manager_ownership_factor"], 1.0),
+        # Owned vehicles are amortized over the years of operation, contracts are paid every year
+        "amortization_cost": np.where(contracted, 0.0, init_cost / operational_years),
+        "contract_cost": np.where(contracted, init_cost, 0.0),
+        "partner_cost": np.where(coulomb, terms["coulomb_partner_cost"] * num_vans, 0.0),
+    })
+    return terms
+
+
+# Function to price yearly revenue and each cost category from scenario terms.
+# Terms may be 2-D (one column per period) to price a time-varying projection.
+def price_terms(terms):
+    battery_issues = terms["battery_issues"] * terms["downtime_factor"]
+    software_issues = terms["software_issues"] * terms["downtime_factor"]
+    revenue = annual_revenue(battery_issues, software_issues, terms["num_vans_2w"], terms["num_vans_3w"],
+                             terms["rev_km"], terms["work_days"], terms["daily_average_km_2w"],
+                             terms["daily_average_km_3w"]) * terms["revenue_share"]
+    breakdown = annual_cost_breakdown(terms["daily_average_km_2w"], terms["num_vans_2w"], terms["daily_average_km_3w"],
+                                      terms["num_vans_3w"], terms["electricity_cost_per_km"], terms["work_hours"],
+                                      terms["work_days"], terms["annual_maintenance_cost"] * terms["upkeep_factor"],
+                                      terms["battery_replacement_cost_2w"] * terms["upkeep_factor"],
+                                      terms["battery_replacement_cost_3w"] * terms["upkeep_factor"],
+                                      terms["driver_wage_2w"], terms["driver_wage_3w"], battery_issues, software_issues,
+                                      revenue, terms["amortization_cost"], terms["basic_insurance_2w"],
+                                      terms["basic_insurance_3w"])
+    breakdown["contract"] = terms["contract_cost"]
+    breakdown["coulomb_partner"] = terms["partner_cost"]
+    return revenue, breakdown
+
+
+# Function to price many scenarios at once, with or without Coulomb
+def price_scenarios(params, operational_years, coulomb=False):
+    terms = scenario_terms(params, operational_years, coulomb)
+    init_cost = terms["init_cost"]
+    revenue, breakdown = price_terms(terms)
+    cost = sum(breakdown.values())
+
+    revenues, costs, profits = yearly_projection(init_cost, revenue, cost, operational_years)
+    total_cost = costs.sum(axis=1)
+    final_profit = profits[:, -1]
+    downtime_percentage = (terms["battery_issues"] + terms["software_issues"]) * terms["downtime_factor"]
+    total_hours = terms["work_hours"] * terms["work_days"] * (1 - downtime_percentage / 100)
+    return {
+        "init_cost": init_cost,
+        "annual_revenue": revenue,
+        "annual_cost": cost,
+        "cost_breakdown": breakdown,
+        "revenues": revenues,
+        "costs": costs,
+        "profits": profits,
+        "total_cost": total_cost,
+        "final_profit": final_profit,
+        "roi": return_on_investment(final_profit, total_cost),
+        "payback_period": payback_period(profits),
+        "fleet_utilization": total_hours / TOTAL_POSSIBLE_HOURS,
+    }
+
+
+# Function to select rows out of a priced result
+def take_rows(result, rows):
+    return {key: take_rows(value, rows) if isinstance(value, dict) else value[rows] for key, value in result.items()}
+
+
+# Function to price every scenario both without and with Coulomb in one batched call
+def compare_scenarios(params, operational_years):
+    columns = scenario_columns(params)
+    size = len(columns["fleet_type"])
+    stacked = {key: np.concatenate([value, value]) for key, value in columns.items()}
+    result = price_scenarios(stacked, operational_years, coulomb=np.arange(2 * size) >= size)
+    return take_rows(result, slice(0, size)), take_rows(result, slice(size, 2 * size))
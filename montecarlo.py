@@ -0,0 +1,80 @@
+import numpy as np
+
+from projection import compare_projection_outputs
+
+# Monte Carlo pricing: draw the uncertain inputs from per-input distributions
+# and push every sample through the vectorized projection, with the same cost
+# escalation as the point estimate, a bounded batch at a time.
+
+UNCERTAIN_INPUTS = ("battery_issues", "software_issues", "daily_average_km_2w", "daily_average_km_3w",
+                    "rev_km", "driver_wage_2w", "driver_wage_3w")
+PERCENT_INPUTS = ("battery_issues", "software_issues")
+DISTRIBUTION_KINDS = ("Fixed", "Normal", "Uniform", "Triangular")
+PERCENTILES = (10, 50, 90)
+
+
+# Function to build a distribution around a point estimate, spread given as a fraction of the value
+def spread_distribution(kind, value, spread):
+    if kind == "Fixed" or spread == 0:
+        return {"kind": "fixed", "value": value}
+    if kind == "Normal":
+        return {"kind": "normal", "mean": value, "std": abs(value) * spread}
+    if kind == "Uniform":
+        return {"kind": "uniform", "low": value * (1 - spread), "high": value * (1 + spread)}
+    if kind == "Triangular":
+        return {"kind": "triangular", "low": value * (1 - spread), "mode": value, "high": value * (1 + spread)}
+    raise ValueError(f"Unknown distribution kind: {kind}")
+
+
+# Function to draw samples from one distribution spec
+def draw(spec, size, rng):
+    kind = spec["kind"]
+    if kind == "fixed":
+        return np.full(size, float(spec["value"]))
+    if kind == "normal":
+        return rng.normal(spec["mean"], spec["std"], size)
+    if kind == "lognormal":
+        return rng.lognormal(spec["mean"], spec["sigma"], size)
+    if kind == "uniform":
+        return rng.uniform(spec["low"], spec["high"], size)
+    if kind == "triangular":
+        if spec["low"] == spec["high"]:
+            return np.full(size, float(spec["mode"]))
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], size)
+    if kind == "empirical":
+        return rng.choice(np.asarray(spec["values"], dtype=float), size)
+    raise ValueError(f"Unknown distribution kind: {kind}")
+
+
+# Function to sample every uncertain input, clipped to the values the widgets allow
+def sample_inputs(distributions, size, seed=None):
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for key, spec in distributions.items():
+        values = np.clip(draw(spec, size, rng), 0, None)
+        if key in PERCENT_INPUTS:
+            values = np.clip(values, 0, 100)
+        samples[key] = values
+    return samples
+
+
+# Function to summarize one side (baseline or Coulomb) of the simulation
+def summarize(result):
+    return {
+        "profit_bands": np.percentile(result["profits"], PERCENTILES, axis=0),
+        "roi_bands": np.percentile(result["roi"], PERCENTILES),
+        "payback_period": result["payback_period"],
+    }
+
+
+# Function to run the simulation for one scenario, pricing baseline and Coulomb together.
+# Escalation options are passed on to project; profit bands are given at whole years.
+def simulate(scenario, distributions, operational_years, samples=50000, seed=None, **escalation):
+    sampled = sample_inputs(distributions, samples, seed)
+    baseline, coulomb = compare_projection_outputs({**scenario, **sampled}, operational_years,
+                                                   ("profits", "roi", "payback_period"), **escalation)
+    return {
+        "years": baseline["years"],
+        "baseline": summarize(baseline),
+        "coulomb": summarize(coulomb),
+    }
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from model import price_scenarios
+from projection import compare_projection_outputs
+
+# Fleet-mix optimizer: search 2W/3W counts and per-vehicle daily km under a
+# capital budget. For fixed daily km, revenue, cost and capital are all linear
+# in the vehicle counts, so ROI, payback and final profit are linear-fractional
+# (or linear) in them and their optimum over the budget polygon lies on its
+# boundary. Only the boundary (the two axes and the budget frontier) is
+# evaluated, which keeps a fleet of thousands of vehicles to a few thousand
+# candidate mixes instead of millions. For a fixed mix the same holds for each
+# vehicle type's daily km, so only the two ends of each km range are tried,
+# and the candidates are projected, with the page's cost escalation, a bounded
+# number of rows at a time.
+
+OBJECTIVES = {
+    "roi": "Max ROI",
+    "payback_period": "Min payback",
+    "final_profit": "Max final cumulative profit",
+}
+MINIMIZE = ("payback_period",)
+# Objectives are compared at this many decimals, so values equal up to rounding noise tie
+TIE_DECIMALS = 9
+
+
+# Function to get the capital needed per 2W and per 3W vehicle from the init_cost formula
+def vehicle_prices(scenario, operational_years):
+    unit_fleets = {**scenario, "num_vans_2w": np.array([1, 0]), "num_vans_3w": np.array([0, 1])}
+    init_cost = price_scenarios(unit_fleets, operational_years)["init_cost"]
+    return float(init_cost[0]), float(init_cost[1])
+
+
+# Function to list the candidate (2W, 3W) counts on the boundary of the budget polygon
+def candidate_mixes(budget, price_2w, price_3w, max_2w, max_3w):
+    limit_2w = max_2w if price_2w <= 0 else min(max_2w, int(budget // price_2w))
+    limit_3w = max_3w if price_3w <= 0 else min(max_3w, int(budget // price_3w))
+    if limit_2w < 0 or limit_3w < 0:
+        return np.empty((0, 2), dtype=int)
+    num_2w = np.arange(limit_2w + 1)
+    if price_3w <= 0:
+        frontier_3w = np.full_like(num_2w, limit_3w)
+    else:
+        frontier_3w = np.minimum(limit_3w, np.floor((budget - price_2w * num_2w) / price_3w)).astype(int)
+    num_3w = np.arange(limit_3w + 1)
+    mixes = np.concatenate([
+        np.column_stack([num_2w, np.zeros_like(num_2w)]),
+        np.column_stack([num_2w, frontier_3w]),
+        np.column_stack([np.zeros_like(num_3w), num_3w]),
+    ])
+    mixes = np.unique(mixes, axis=0)
+    return mixes[mixes.sum(axis=1) > 0]
+
+
+# Function to keep the mixes no other mix beats on both capital and objective, ordered by capital.
+# Ties on the objective go to the higher final profit: ROI and payback do not change with fleet
+# size, so without it the smallest fleet would always win and the budget would go unused.
+def pareto_front(frame, objective):
+    sign = -1 if objective in MINIMIZE else 1
+    score = np.round(sign * frame[objective].fillna(-np.inf if sign > 0 else np.inf).to_numpy(), TIE_DECIMALS)
+    # Rank of each mix by objective, then final profit; equal pairs share a rank
+    _, rank = np.unique(np.column_stack([score, frame["final_profit"].to_numpy()]), axis=0, return_inverse=True)
+    rank = rank.ravel()
+    order = np.lexsort((-rank, frame["capital"].to_numpy()))
+    rank = rank[order]
+    best_before = np.concatenate([[-1], np.maximum.accumulate(rank)[:-1]])
+    return frame.iloc[order[rank > best_before]].reset_index(drop=True)
+
+
+# Function to list the daily km values tried for one vehicle type: the two ends of its range
+def km_candidates(km_range):
+    return np.unique(np.asarray(km_range, dtype=float))
+
+
+# Function to search fleet mixes and daily km under a capital budget, without and with Coulomb
+def optimize_fleet(scenario, operational_years, budget, objective="roi", max_2w=5000, max_3w=5000,
+                   km_2w_range=(40, 120), km_3w_range=(60, 150), **escalation):
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    price_2w, price_3w = vehicle_prices(scenario, operational_years)
+    mixes = candidate_mixes(budget, price_2w, price_3w, max_2w, max_3w)
+    km_2w, km_3w = np.meshgrid(km_candidates(km_2w_range), km_candidates(km_3w_range))
+    km_2w, km_3w = km_2w.ravel(), km_3w.ravel()
+
+    # Every (mix, km pair) combination
+    num_2w = np.repeat(mixes[:, 0], len(km_2w))
+    num_3w = np.repeat(mixes[:, 1], len(km_2w))
+    daily_km_2w = np.tile(km_2w, len(mixes))
+    daily_km_3w = np.tile(km_3w, len(mixes))
+    params = {**scenario, "num_vans_2w": num_2w, "num_vans_3w": num_3w,
+              "daily_average_km_2w": daily_km_2w, "daily_average_km_3w": daily_km_3w}
+    baseline, coulomb = compare_projection_outputs(params, operational_years,
+                                                   {"init_cost", "final_profit", objective}, **escalation)
+
+    results = {"evaluated": len(num_2w), "price_2w": price_2w, "price_3w": price_3w}
+    for name, result in (("baseline", baseline), ("coulomb", coulomb)):
+        frame = pd.DataFrame({
+            "num_vans_2w": num_2w,
+            "num_vans_3w": num_3w,
+            "daily_average_km_2w": daily_km_2w,
+            "daily_average_km_3w": daily_km_3w,
+            "capital": result["init_cost"],
+            "final_profit": result["final_profit"],
+            objective: result[objective],
+        })
+        front = pareto_front(frame, objective)
+        # The front improves with every step in capital, so its last mix is the best
+        best = front.iloc[-1] if len(front) else None
+        results[name] = {"best": best, "front": front}
+    return results
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Per-rerun instrumentation for the Streamlit page. A profiler times the
+# stages of one rerun, counts allocations and chart spec sizes, tracks cache
+# hits and can append the result as one JSON line to a log file. When it is
+# disabled every call returns straight away, so it can stay wired in.
+# Laps split the whole script into consecutive sections; stages time blocks
+# inside them (chart spec building and rendering), so the two overlap.
+# A fragment that reruns on its own is profiled as a rerun of its own, logged
+# with its name under "fragment".
+#
+# Set COULOMB_PROFILE=1 to profile every rerun, and COULOMB_PROFILE_LOG to
+# choose the JSON lines file (default rerun_profile.jsonl).
+
+PROFILE_ENV = "COULOMB_PROFILE"
+PROFILE_LOG_ENV = "COULOMB_PROFILE_LOG"
+DEFAULT_PROFILE_LOG = "rerun_profile.jsonl"
+
+_NULL_STAGE = nullcontext()
+_log_lock = threading.Lock()
+# Streamlit runs each session's reruns on its own thread
+_current = threading.local()
+
+
+class RerunProfiler:
+    def __init__(self, enabled=False, log_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.stages = {}
+        self.counters = {}
+        self.chart_spec_bytes = []
+        self._caches = {}
+        self.finished = False
+        self._started = self._last_lap = time.perf_counter() if enabled else 0.0
+
+    def _add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    # Time a block; stages with the same name add up
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_time(name, time.perf_counter() - start)
+
+    # Record the time since the previous lap (or the start) under name, for straight-line script code
+    def lap(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._add_time(name, now - self._last_lap)
+        self._last_lap = now
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_chart_spec(self, spec):
+        if self.enabled:
+            self.chart_spec_bytes.append(len(json.dumps(spec, default=str)))
+
+    # Report hits and misses of a cache that happen during this rerun
+    def watch_cache(self, name, cache):
+        if self.enabled:
+            self._caches[name] = (cache, cache.hits, cache.misses)
+
+    # Function to close the rerun, write its JSON line and return the record
+    def finish(self, **extra):
+        self.finished = True
+        if not self.enabled:
+            return None
+        record = {
+            "timestamp": time.time(),
+            "total_ms": (time.perf_counter() - self._started) * 1000,
+            "stages_ms": self.stages,
+            "counters": self.counters,
+            "chart_spec_bytes": self.chart_spec_bytes,
+            "caches": {
+                name: {"hits": cache.hits - hits, "misses": cache.misses - misses, "size": len(cache)}
+                for name, (cache, hits, misses) in self._caches.items()
+            },
+            **extra,
+        }
+        if self.log_path:
+            line = json.dumps(record, default=str)
+            with _log_lock, open(self.log_path, "a") as file:
+                file.write(line + "\n")
+        return record
+
+
+# Function to start profiling a rerun on the current thread
+def start_rerun(enabled=None, log_path=None):
+    if enabled is None:
+        enabled = os.environ.get(PROFILE_ENV, "") not in ("", "0")
+    if log_path is None and os.environ.get(PROFILE_ENV, "") not in ("", "0"):
+        log_path = os.environ.get(PROFILE_LOG_ENV, DEFAULT_PROFILE_LOG)
+    _current.profiler = RerunProfiler(enabled, log_path)
+    return _current.profiler
+
+
+# Function to get the profiler of the rerun running on this thread (a disabled one if none)
+def current_profiler():
+    profiler = getattr(_current, "profiler", None)
+    return profiler if profiler is not None else _DISABLED
+
+
+# Function to profile a fragment. Inside a full rerun it uses that rerun's profiler; a fragment
+# rerunning on its own gets a profiler of its own, finished when the fragment ends.
+@contextmanager
+def fragment_profiler(name, enabled=None, log_path=None, **extra):
+    profiler = getattr(_current, "profiler", None)
+    if profiler is not None and not profiler.finished:
+        yield profiler
+        return
+    profiler = start_rerun(enabled, log_path)
+    try:
+        yield profiler
+    finally:
+        profiler.finish(fragment=name, **extra)
+
+
+_DISABLED = RerunProfiler(enabled=False)
@@ -0,0 +1,125 @@
+import numpy as np
+
+from model import FLEET_TYPES, TOTAL_POSSIBLE_HOURS, payback_period, price_terms, return_on_investment, scenario_columns, scenario_terms, take_rows
+
+# Time-varying projection. Every cost line is priced per period (year, month
+# or week) so wages and electricity can inflate, battery spend can grow as
+# capacity fades and downtime can ramp over the life of the fleet. With no
+# escalation and yearly periods it reproduces price_scenarios exactly.
+
+PERIODS_PER_YEAR = {"Yearly": 1, "Monthly": 12, "Weekly": 52}
+COST_CATEGORIES = {
+    "electricity": "Electricity",
+    "maintenance": "Maintenance",
+    "battery": "Battery",
+    "driver": "Driver",
+    "downtime": "Downtime",
+    "insurance": "Insurance",
+    "amortization": "Amortization",
+    "contract": "Contract",
+    "coulomb_partner": "Coulomb Partner",
+    "initial": "Initial",
+}
+# Scenario rows times periods projected per batched call by compare_projection_outputs, which bounds its memory
+CHUNK_CELLS = 1000000
+
+
+# Function to project revenue, each cost category and cumulative profit period by period.
+# Inflation, battery_fade and discount_rate are yearly fractions; downtime_ramp is in
+# percentage points per year, added to both battery and software problems.
+def project(params, operational_years, coulomb=False, periods_per_year=1, wage_inflation=0.0,
+            electricity_inflation=0.0, battery_fade=0.0, downtime_ramp=0.0, discount_rate=0.0):
+    if not 0 <= battery_fade < 1:
+        raise ValueError("battery_fade must be in [0, 1)")
+    terms = scenario_terms(params, operational_years, coulomb)
+    size = len(terms["fleet_type"])
+    num_periods = operational_years * periods_per_year
+
+    # Whole years elapsed at the start of each period; escalation steps once a year
+    elapsed = np.arange(num_periods) // periods_per_year
+    per_period = {key: np.asarray(value)[:, None] for key, value in terms.items()}
+    per_period["driver_wage_2w"] = per_period["driver_wage_2w"] * (1 + wage_inflation) ** elapsed
+    per_period["driver_wage_3w"] = per_period["driver_wage_3w"] * (1 + wage_inflation) ** elapsed
+    per_period["electricity_cost_per_km"] = per_period["electricity_cost_per_km"] * (1 + electricity_inflation) ** elapsed
+    # Replacement spend grows as the remaining battery capacity fades
+    battery_health = (1 - battery_fade) ** elapsed
+    per_period["battery_replacement_cost_2w"] = per_period["battery_replacement_cost_2w"] / battery_health
+    per_period["battery_replacement_cost_3w"] = per_period["battery_replacement_cost_3w"] / battery_health
+    battery_issues = np.clip(per_period["battery_issues"] + downtime_ramp * elapsed, 0, 100)
+    software_issues = np.clip(per_period["software_issues"] + downtime_ramp * elapsed, 0, 100)
+    # Both kinds of downtime together cannot take more than all of the time; past that they shrink in proportion
+    share = 100 / np.maximum(battery_issues + software_issues, 100)
+    per_period["battery_issues"] = battery_issues * share
+    per_period["software_issues"] = software_issues * share
+    revenue, breakdown = price_terms(per_period)
+
+    # Yearly amounts are spread evenly over the periods of the year; period 0 holds the initial cost
+    def spread(yearly):
+        return np.concatenate([np.zeros((size, 1)), np.broadcast_to(yearly, (size, num_periods)) / periods_per_year], axis=1)
+
+    revenues = spread(revenue)
+    breakdown = {key: spread(value) for key, value in breakdown.items()}
+    breakdown["initial"] = np.zeros((size, num_periods + 1))
+    breakdown["initial"][:, 0] = terms["init_cost"]
+    costs = sum(breakdown.values())
+
+    cash_flow = revenues - costs
+    profits = np.cumsum(cash_flow, axis=1)
+    discount = (1 + discount_rate) ** (-np.arange(num_periods + 1) / periods_per_year)
+    discounted_profits = np.cumsum(cash_flow * discount, axis=1)
+    total_cost = costs.sum(axis=1)
+    final_profit = profits[:, -1]
+    downtime_percentage = (per_period["battery_issues"] + per_period["software_issues"]) * per_period["downtime_factor"]
+    total_hours = terms["work_hours"][:, None] * terms["work_days"][:, None] * (1 - downtime_percentage / 100)
+    return {
+        "years": np.arange(num_periods + 1) / periods_per_year,
+        "init_cost": terms["init_cost"],
+        "revenues": revenues,
+        "costs": costs,
+        "cost_breakdown": breakdown,
+        "profits": profits,
+        "discounted_profits": discounted_profits,
+        "total_cost": total_cost,
+        "final_profit": final_profit,
+        "npv": discounted_profits[:, -1],
+        "roi": return_on_investment(final_profit, total_cost),
+        "payback_period": payback_period(profits, 1 / periods_per_year),
+        "discounted_payback_period": payback_period(discounted_profits, 1 / periods_per_year),
+        "fleet_utilization": np.broadcast_to(total_hours, (size, num_periods)).mean(axis=1) / TOTAL_POSSIBLE_HOURS,
+    }
+
+
+# Function to project every scenario both without and with Coulomb in one batched call
+def compare_projections(params, operational_years, **options):
+    columns = scenario_columns(params)
+    size = len(columns["fleet_type"])
+    stacked = {key: np.concatenate([value, value]) for key, value in columns.items()}
+    result = project(stacked, operational_years, coulomb=np.arange(2 * size) >= size, **options)
+    years = result.pop("years")
+    baseline, coulomb = take_rows(result, slice(0, size)), take_rows(result, slice(size, 2 * size))
+    return {**baseline, "years": years}, {**coulomb, "years": years}
+
+
+# Function to project one scenario as each fleet type, without and with Coulomb, in one batched call.
+# Rows of both results follow FLEET_TYPES.
+def compare_fleet_types(scenario, operational_years, **options):
+    return compare_projections({**scenario, "fleet_type": np.array(FLEET_TYPES)}, operational_years, **options)
+
+
+# Function to project many scenarios without and with Coulomb a bounded number of rows at a time,
+# keeping only `outputs`. Per-period outputs are kept at whole years, so the result does not grow
+# with the period length.
+def compare_projection_outputs(params, operational_years, outputs, **options):
+    columns = scenario_columns(params)
+    size = len(columns["fleet_type"])
+    periods_per_year = options.get("periods_per_year", 1)
+    rows = max(1, CHUNK_CELLS // (2 * (operational_years * periods_per_year + 1)))
+    parts = ([], [])
+    # An empty batch still runs once, so every output comes back with its shape
+    for start in range(0, max(size, 1), rows):
+        chunk = take_rows(columns, slice(start, start + rows))
+        for part, result in zip(parts, compare_projections(chunk, operational_years, **options)):
+            part.append({key: result[key][:, ::periods_per_year] if result[key].ndim == 2 else result[key] for key in outputs})
+    baseline, coulomb = ({key: np.concatenate([chunk[key] for chunk in part]) for key in outputs} for part in parts)
+    years = np.arange(operational_years + 1)
+    return {**baseline, "years": years}, {**coulomb, "years": years}
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from model import DEFAULT_INPUTS, scenario_columns
+from projection import compare_projection_outputs
+
+# Sensitivity analysis over the baseline-vs-Coulomb model. Every perturbed
+# scenario is stacked into one batch and projected with the same cost escalation
+# as the point estimate, a bounded number of rows at a time.
+
+METRICS = {
+    "roi": "Return on Investment (%)",
+    "payback_period": "Payback Period (Years)",
+    "final_profit": "Final Cumulative Profit",
+}
+SCENARIOS = {"baseline": "Without Coulomb", "coulomb": "With Coulomb"}
+INTEGER_FIELDS = ("num_vans_2w", "num_vans_3w", "work_hours", "work_days")
+
+
+# Function to pick the values swept along one axis; counts are kept whole
+def sweep_values(field, low, high, steps):
+    values = np.linspace(low, high, steps)
+    if field in INTEGER_FIELDS:
+        values = np.unique(np.round(values))
+    return values
+
+
+# Function to vary each field down and up by `change` (a fraction) and record the metric swing
+def tornado(scenario, operational_years, metric="roi", fields=None, change=0.1, **escalation):
+    fields = list(fields or DEFAULT_INPUTS)
+    base = scenario_columns(scenario)
+    size = 1 + 2 * len(fields)
+    batch = {key: np.repeat(value, size) for key, value in base.items()}
+    for index, field in enumerate(fields):
+        batch[field][1 + 2 * index] *= 1 - change
+        batch[field][2 + 2 * index] *= 1 + change
+    results = dict(zip(SCENARIOS, compare_projection_outputs(batch, operational_years, (metric,), **escalation)))
+
+    rows = []
+    for name, result in results.items():
+        values = result[metric]
+        for index, field in enumerate(fields):
+            low, high = values[1 + 2 * index], values[2 + 2 * index]
+            rows.append({
+                "Input": field,
+                "Scenario": SCENARIOS[name],
+                "Low Value": batch[field][1 + 2 * index],
+                "High Value": batch[field][2 + 2 * index],
+                "Base": values[0],
+                "Low": low,
+                "High": high,
+                "Swing": abs(high - low),
+            })
+    return pd.DataFrame(rows).sort_values("Swing", ascending=False, ignore_index=True)
+
+
+# Function to evaluate the metric on every (x, y) cell of a 2-D grid, without and with Coulomb
+def grid_sweep(scenario, operational_years, x_field, x_values, y_field, y_values, metric="roi", **escalation):
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    x_grid, y_grid = np.meshgrid(x_values, y_values)
+    params = {**scenario, x_field: x_grid.ravel(), y_field: y_grid.ravel()}
+    baseline, coulomb = compare_projection_outputs(params, operational_years, (metric,), **escalation)
+    shape = (len(y_values), len(x_values))
+    return {
+        "x": x_values,
+        "y": y_values,
+        "baseline": baseline[metric].reshape(shape),
+        "coulomb": coulomb[metric].reshape(shape),
+    }
+
+
+# Function to get the width of one heatmap cell along a swept axis
+def cell_size(values):
+    return float(np.diff(values).min()) if len(values) > 1 else 1.0
+
+
+# Function to mark the swept values whose cells overlap a (low, high) view range
+def in_view(values, view=None):
+    if view is None:
+        return np.ones(len(values), dtype=bool)
+    half = cell_size(values) / 2
+    return (values + half >= view[0]) & (values - half <= view[1])
+
+
+# Function to turn one side of a sweep into heatmap cells (x, y, value at the cell centres),
+# keeping only the cells in view. The chart draws each cell cell_size wide around its centre.
+def grid_frame(sweep, name, x_view=None, y_view=None):
+    x_keep = in_view(sweep["x"], x_view)
+    y_keep = in_view(sweep["y"], y_view)
+    x_grid, y_grid = np.meshgrid(sweep["x"][x_keep], sweep["y"][y_keep])
+    return pd.DataFrame({
+        "x": x_grid.ravel(),
+        "y": y_grid.ravel(),
+        "value": sweep[name][np.ix_(y_keep, x_keep)].ravel(),
+    })
@@ -0,0 +1,328 @@
+import argparse
+import json
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from cache import LRUCache
+from model import DEFAULT_FLEET_INPUTS, DEFAULT_INPUTS, DEFAULT_OPERATIONAL_YEARS, FLEET_TYPES, MODEL_FIELDS, compare_scenarios
+
+# Local HTTP pricing API for other systems (e.g. quoting). Usage:
+#
+#   python server.py --port 8000
+#   curl -d '{"fleet_type": "DCO Fleet", "num_vans_3w": 10}' localhost:8000/price
+#
+# POST /price takes one scenario, a list of scenarios or {"scenarios": [...]}.
+# A scenario has the keys of st.session_state.inputs plus fleet_type, the
+# vehicle counts, daily km, work hours/days and downtime (amounts in ₹, as on
+# the page), and optionally operational_years; missing keys fall back to the
+# page defaults. Each result has the ROI, payback period and the other page
+# metrics without and with Coulomb. GET /stats reports cache and batch counters.
+#
+# Requests that arrive together are priced as one vectorised batch by a single
+# pricing thread, and repeated scenarios are answered from an LRU cache.
+
+DEFAULT_PORT = 8000
+DEFAULT_MAX_BATCH = 512
+DEFAULT_MAX_WAIT_MS = 1.0
+DEFAULT_CACHE_SIZE = 65536
+MAX_SCENARIOS_PER_REQUEST = 10000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_OPERATIONAL_YEARS = 100
+# Upper bounds of the inputs the page caps; every numeric input must also be 0 or more, as on the page
+FIELD_MAXIMUMS = {"battery_issues": 100, "software_issues": 100, "manager_ownership_factor": 1}
+RESULT_FIELDS = ("init_cost", "annual_revenue", "annual_cost", "total_cost", "final_profit", "roi", "payback_period", "fleet_utilization")
+
+
+# Function to refuse the NaN and Infinity literals Python's JSON parser accepts but JSON does not have
+def reject_constant(name):
+    raise ValueError(f"{name} is not a valid JSON number")
+
+
+# Function to validate one scenario payload and fill in the page defaults
+def normalize_scenario(payload):
+    if not isinstance(payload, dict):
+        raise ValueError("A scenario must be a JSON object")
+    unknown = set(payload) - set(MODEL_FIELDS) - {"operational_years"}
+    if unknown:
+        raise ValueError(f"Unknown input(s): {', '.join(sorted(unknown))}")
+    scenario = {**DEFAULT_INPUTS, **DEFAULT_FLEET_INPUTS, "fleet_type": FLEET_TYPES[0]}
+    for key, value in payload.items():
+        if key == "operational_years":
+            continue
+        if key == "fleet_type":
+            if value not in FLEET_TYPES:
+                raise ValueError(f"Unknown fleet type: {value}")
+            scenario[key] = value
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"{key} must be a finite number")
+        elif value < 0:
+            raise ValueError(f"{key} must not be negative")
+        elif value > FIELD_MAXIMUMS.get(key, math.inf):
+            raise ValueError(f"{key} must be from 0 to {FIELD_MAXIMUMS[key]}")
+        else:
+            scenario[key] = float(value)
+    years = payload.get("operational_years", DEFAULT_OPERATIONAL_YEARS)
+    if isinstance(years, bool) or not isinstance(years, (int, float)) or not math.isfinite(years) or years != int(years) \
+            or not 1 <= years <= MAX_OPERATIONAL_YEARS:
+        raise ValueError(f"operational_years must be a whole number from 1 to {MAX_OPERATIONAL_YEARS}")
+    return scenario, int(years)
+
+
+# Function to get the cache key of a normalized scenario. Normalized scenarios
+# always hold every model field as a float, so the values in field order are
+# canonical without going through canonical_key.
+def scenario_key(scenario, operational_years):
+    return (operational_years, *(scenario[key] for key in MODEL_FIELDS))
+
+
+# Function to turn a priced batch into one JSON-ready result per row
+def result_rows(scenarios, operational_years, baseline, coulomb):
+    columns = {}
+    for name, result in (("baseline", baseline), ("coulomb", coulomb)):
+        columns[name] = {field: result[field].tolist() for field in RESULT_FIELDS}
+        columns[name]["cumulative_profit"] = result["profits"].tolist()
+    cost_savings = (baseline["total_cost"] - coulomb["total_cost"]).tolist()
+    rows = []
+    for index, scenario in enumerate(scenarios):
+        row = {"fleet_type": scenario["fleet_type"], "operational_years": operational_years, "cost_savings": cost_savings[index]}
+        for name in ("baseline", "coulomb"):
+            priced = {field: values[index] for field, values in columns[name].items()}
+            # JSON has no NaN: a fleet that never breaks even has no payback period
+            if math.isnan(priced["payback_period"]):
+                priced["payback_period"] = None
+            row[name] = priced
+        rows.append(row)
+    return rows
+
+
+# Function to price (scenario, operational_years) pairs with one vectorised call per horizon.
+# Results are JSON text, so a cached result is sent without encoding it again. A scenario
+# whose inputs are so large that its results overflow gets a ValueError instead.
+def price_json(scenarios):
+    results = [None] * len(scenarios)
+    by_years = {}
+    for index, (_, years) in enumerate(scenarios):
+        by_years.setdefault(years, []).append(index)
+    for years, indices in by_years.items():
+        group = [scenarios[index][0] for index in indices]
+        params = {key: np.array([scenario[key] for scenario in group]) for key in MODEL_FIELDS}
+        with np.errstate(over="ignore", invalid="ignore"):
+            rows = result_rows(group, years, *compare_scenarios(params, years))
+        for index, row in zip(indices, rows):
+            try:
+                results[index] = json.dumps(row, allow_nan=False)
+            except ValueError:
+                results[index] = ValueError("Inputs are too large: the results are not finite numbers")
+    return results
+
+
+class PricingService:
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, cache_size=DEFAULT_CACHE_SIZE):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = LRUCache(cache_size)
+        self.batches = 0
+        self.batched_scenarios = 0
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="pricing-batcher", daemon=True)
+        self._worker.start()
+
+    def close(self):
+        self._stopped.set()
+        self._worker.join()
+
+    # Function to price validated scenarios, from the cache where possible; returns one JSON result
+    # per scenario, or a ValueError for a scenario whose results are not finite
+    def price(self, scenarios):
+        results = [None] * len(scenarios)
+        pending = []
+        with self._cache_lock:
+            for index, (scenario, years) in enumerate(scenarios):
+                key = scenario_key(scenario, years)
+                cached = self.cache.get(key)
+                if cached is None:
+                    pending.append((index, key))
+                else:
+                    results[index] = cached
+        if len(pending) == 1:
+            # A lone scenario waits to be priced together with other requests
+            future = Future()
+            self._queue.put((scenarios[pending[0][0]], future))
+            results[pending[0][0]] = future.result()
+        elif pending:
+            # A batched request is already big enough to price on its own
+            priced = price_json([scenarios[index] for index, _ in pending])
+            for (index, _), result in zip(pending, priced):
+                results[index] = result
+        if pending:
+            with self._cache_lock:
+                for index, key in pending:
+                    if not isinstance(results[index], ValueError):
+                        self.cache.put(key, results[index])
+        return results
+
+    # Pricing thread: take whatever is queued (waiting up to max_wait for more) and price it in one call
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+            self._price_batch(batch)
+
+    def _price_batch(self, batch):
+        try:
+            results = price_json([scenario for scenario, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        self.batches += 1
+        self.batched_scenarios += len(batch)
+
+    def stats(self):
+        with self._cache_lock:
+            cache_stats = self.cache.stats()
+        return {
+            "cache": cache_stats,
+            "batches": self.batches,
+            "batched_scenarios": self.batched_scenarios,
+            "mean_batch_size": self.batched_scenarios / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+class PricingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for many clients connecting at once (socketserver's default backlog is 5)
+    request_queue_size = 1024
+
+
+class PricingHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a client can send many requests over one connection
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body):
+        self.send_json_text(status, json.dumps(body))
+
+    def send_json_text(self, status, text):
+        data = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self.send_json(200, self.server.service.stats())
+        else:
+            self.send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # Without a usable length the body cannot be told apart from the next request
+            self.close_connection = True
+            self.send_json(400, {"error": "Content-Length must be a whole number of bytes"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.send_json(413, {"error": f"Request body is larger than {MAX_BODY_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+        if self.path != "/price":
+            self.send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            payload = json.loads(body, parse_constant=reject_constant)
+            batched = not isinstance(payload, dict) or "scenarios" in payload
+            if not batched:
+                items = [payload]
+            else:
+                items = payload["scenarios"] if isinstance(payload, dict) else payload
+            if not isinstance(items, list) or not items:
+                raise ValueError("scenarios must be a non-empty list")
+            if len(items) > MAX_SCENARIOS_PER_REQUEST:
+                raise ValueError(f"At most {MAX_SCENARIOS_PER_REQUEST} scenarios per request")
+            scenarios = []
+            for index, item in enumerate(items):
+                try:
+                    scenarios.append(normalize_scenario(item))
+                except ValueError as error:
+                    raise ValueError(f"Scenario {index}: {error}" if batched else str(error))
+        except ValueError as error:
+            # json.JSONDecodeError is a ValueError too
+            self.send_json(400, {"error": str(error)})
+            return
+        results = self.server.service.price(scenarios)
+        for index, result in enumerate(results):
+            if isinstance(result, ValueError):
+                self.send_json(400, {"error": f"Scenario {index}: {result}" if batched else str(result)})
+                return
+        self.send_json_text(200, f'{{"results": [{", ".join(results)}]}}' if batched else results[0])
+
+
+# Function to create the HTTP server; call serve_forever() on it to start serving
+def create_server(host="127.0.0.1", port=DEFAULT_PORT, service=None, verbose=False):
+    server = PricingServer((host, port), PricingHandler)
+    server.service = service or PricingService()
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the fleet pricing model over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Most scenarios priced in one batch")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="How long a batch waits for more requests")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Priced scenarios kept in the cache")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    service = PricingService(args.max_batch, args.max_wait_ms, args.cache_size)
+    server = create_server(args.host, args.port, service, args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
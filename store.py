@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch import ChunkWriter
+from model import DEFAULT_FLEET_INPUTS, DEFAULT_INPUTS, DEFAULT_OPERATIONAL_YEARS, FLEET_TYPES, MODEL_FIELDS
+from projection import compare_projections
+
+# Local scenario store: saved scenarios (customer, fleet type, currency and the
+# full input set) with their priced yearly series, in one SQLite file.
+#
+# Priced results are stored once per distinct input set, keyed by a content
+# hash of the inputs, horizon, escalation and currency; saving a scenario
+# whose inputs were priced before reuses that result instead of recomputing
+# it. Listing is indexed by customer, fleet type and creation time, and the
+# series are kept as packed float64 blobs so a reload is one row read.
+# Bulk export from the command line:
+#
+#   python store.py export saved.parquet --customer "Acme Logistics"
+
+DEFAULT_STORE = "scenarios.db"
+DEFAULT_LIST_LIMIT = 100
+EXPORT_CHUNK_SIZE = 50000
+SERIES_NAMES = ("years", "revenues", "costs", "profits", "coulomb_revenues", "coulomb_costs", "coulomb_profits")
+METRIC_NAMES = ("total_cost", "final_profit", "roi", "payback_period", "npv", "fleet_utilization")
+METRIC_COLUMNS = tuple(f"{prefix}{name}" for prefix in ("", "coulomb_") for name in METRIC_NAMES)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    inputs TEXT NOT NULL,
+    series BLOB NOT NULL,
+    {", ".join(f"{name} REAL" for name in METRIC_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    customer TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    fleet_type TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    operational_years INTEGER NOT NULL,
+    result_id INTEGER NOT NULL REFERENCES results(id),
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_customer ON scenarios(customer, created_at);
+CREATE INDEX IF NOT EXISTS scenarios_customer_fleet_type ON scenarios(customer, fleet_type, created_at);
+CREATE INDEX IF NOT EXISTS scenarios_fleet_type ON scenarios(fleet_type, created_at);
+CREATE INDEX IF NOT EXISTS scenarios_created_at ON scenarios(created_at);
+"""
+
+
+# Function to put a scenario's inputs into one canonical form: every model field, floats for numbers
+def canonical_inputs(scenario, operational_years, currency, escalation=None):
+    if scenario.get("fleet_type", FLEET_TYPES[0]) not in FLEET_TYPES:
+        raise ValueError(f"Unknown fleet type: {scenario['fleet_type']}")
+    defaults = {**DEFAULT_INPUTS, **DEFAULT_FLEET_INPUTS, "fleet_type": FLEET_TYPES[0]}
+    values = {key: scenario.get(key, defaults[key]) for key in MODEL_FIELDS}
+    return {
+        "scenario": {key: value if key == "fleet_type" else float(value) for key, value in values.items()},
+        "operational_years": int(operational_years),
+        "currency": currency,
+        "escalation": {key: int(value) if key == "periods_per_year" else float(value)
+                       for key, value in sorted((escalation or {}).items())},
+    }
+
+
+# Function to hash canonical inputs; identical inputs always give the same hash
+def content_hash(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+# Function to price canonical inputs into the stored series and metrics
+def price_inputs(inputs):
+    baseline, coulomb = compare_projections(inputs["scenario"], inputs["operational_years"], **inputs["escalation"])
+    series = np.stack([baseline["years"], baseline["revenues"][0], baseline["costs"][0], baseline["profits"][0],
+                       coulomb["revenues"][0], coulomb["costs"][0], coulomb["profits"][0]])
+    metrics = {}
+    for prefix, result in (("", baseline), ("coulomb_", coulomb)):
+        for name in METRIC_NAMES:
+            value = float(result[name][0])
+            metrics[f"{prefix}{name}"] = None if np.isnan(value) else value
+    return series, metrics
+
+
+# Function to build the WHERE clause that selects saved scenarios (aliased s)
+def scenario_filter(customer=None, fleet_type=None, before=None):
+    conditions, parameters = [], []
+    for condition, value in (("s.customer = ?", customer), ("s.fleet_type = ?", fleet_type), ("s.created_at < ?", before)):
+        if value is not None:
+            conditions.append(condition)
+            parameters.append(value)
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), parameters
+
+
+class ScenarioStore:
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        # One connection shared by Streamlit's session threads, used under a lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    # Function to save a scenario for a customer; returns its id and whether an earlier result was reused
+    def save(self, customer, scenario, operational_years=DEFAULT_OPERATIONAL_YEARS, currency="₹", escalation=None, name=""):
+        if not customer:
+            raise ValueError("A saved scenario needs a customer")
+        inputs = canonical_inputs(scenario, operational_years, currency, escalation)
+        digest = content_hash(inputs)
+        with self._lock:
+            row = self._connection.execute("SELECT id FROM results WHERE content_hash = ?", (digest,)).fetchone()
+        reused = row is not None
+        if reused:
+            result_id = row[0]
+        else:
+            series, metrics = price_inputs(inputs)
+        with self._lock, self._connection:
+            if not reused:
+                # Another thread may have stored the same inputs meanwhile; the hash is unique
+                self._connection.execute(
+                    f"INSERT OR IGNORE INTO results (content_hash, inputs, series, {', '.join(METRIC_COLUMNS)}) "
+                    f"VALUES (?, ?, ?, {', '.join('?' * len(METRIC_COLUMNS))})",
+                    (digest, json.dumps(inputs), series.astype(np.float64).tobytes(), *(metrics[name] for name in METRIC_COLUMNS)))
+                result_id = self._connection.execute("SELECT id FROM results WHERE content_hash = ?", (digest,)).fetchone()[0]
+            cursor = self._connection.execute(
+                "INSERT INTO scenarios (customer, name, fleet_type, currency, operational_years, result_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (customer, name, inputs["scenario"]["fleet_type"], currency, inputs["operational_years"], result_id, time.time()))
+        return cursor.lastrowid, reused
+
+    # Function to list saved scenarios, newest first, with their headline metrics.
+    # Pass the created_at of the last row as before to get the next page.
+    def list_scenarios(self, customer=None, fleet_type=None, limit=DEFAULT_LIST_LIMIT, before=None):
+        where, parameters = scenario_filter(customer, fleet_type, before)
+        query = f"""
+            SELECT s.id, s.customer, s.name, s.fleet_type, s.currency, s.operational_years, s.created_at,
+                   r.roi, r.coulomb_roi, r.payback_period, r.coulomb_payback_period
+            FROM scenarios s JOIN results r ON r.id = s.result_id
+            {where} ORDER BY s.created_at DESC LIMIT ?"""
+        with self._lock:
+            rows = self._connection.execute(query, (*parameters, limit)).fetchall()
+        return pd.DataFrame([dict(row) for row in rows], columns=[
+            "id", "customer", "name", "fleet_type", "currency", "operational_years", "created_at",
+            "roi", "coulomb_roi", "payback_period", "coulomb_payback_period"])
+
+    # Function to reload a saved scenario with its inputs, metrics and yearly series
+    def load(self, scenario_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT s.id, s.customer, s.name, s.created_at, r.* FROM scenarios s JOIN results r ON r.id = s.result_id "
+                "WHERE s.id = ?", (scenario_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No saved scenario with id {scenario_id}")
+        inputs = json.loads(row["inputs"])
+        series = np.frombuffer(row["series"], dtype=np.float64).reshape(len(SERIES_NAMES), -1)
+        loaded = {"id": row[0], "customer": row["customer"], "name": row["name"], "created_at": row["created_at"], **inputs}
+        for prefix, name in (("", "baseline"), ("coulomb_", "coulomb")):
+            loaded[name] = {
+                "years": series[0],
+                **{key: series[SERIES_NAMES.index(f"{prefix}{key}")] for key in ("revenues", "costs", "profits")},
+                **{metric: row[f"{prefix}{metric}"] for metric in METRIC_NAMES},
+            }
+        return loaded
+
+    # Function to write saved scenarios (inputs and metrics, one row each) to a CSV or Parquet file
+    def export(self, path, customer=None, fleet_type=None, chunk_size=EXPORT_CHUNK_SIZE):
+        where, parameters = scenario_filter(customer, fleet_type)
+        query = f"""
+            SELECT s.id, s.customer, s.name, s.currency, s.operational_years, s.created_at, r.content_hash, r.inputs,
+                   {", ".join(f"r.{name}" for name in METRIC_COLUMNS)}
+            FROM scenarios s JOIN results r ON r.id = s.result_id {where} ORDER BY s.id"""
+        writer = ChunkWriter(path)
+        # A separate read-only connection, so a long export does not hold the lock saves need
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            for chunk in pd.read_sql_query(query, connection, params=parameters, chunksize=chunk_size):
+                # Scenarios saved with the same inputs share a result, so each distinct input set is parsed once
+                texts = chunk.pop("inputs")
+                parsed = pd.DataFrame([json.loads(text)["scenario"] for text in texts.unique()], index=texts.unique())
+                inputs = parsed.loc[texts].set_index(chunk.index)
+                writer.write(pd.concat([chunk[["id", "customer", "name"]], inputs, chunk.drop(columns=["id", "customer", "name"])], axis=1))
+        finally:
+            connection.close()
+            writer.close()
+        return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and export saved scenarios.")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="SQLite scenario store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="List the newest saved scenarios")
+    list_parser.add_argument("--customer", default=None)
+    list_parser.add_argument("--fleet-type", default=None, choices=FLEET_TYPES)
+    list_parser.add_argument("--limit", type=int, default=DEFAULT_LIST_LIMIT)
+    export_parser = subparsers.add_parser("export", help="Export saved scenarios to CSV or Parquet")
+    export_parser.add_argument("output", help="CSV or Parquet file")
+    export_parser.add_argument("--customer", default=None)
+    export_parser.add_argument("--fleet-type", default=None, choices=FLEET_TYPES)
+    args = parser.parse_args(argv)
+
+    store = ScenarioStore(args.store)
+    try:
+        if args.command == "list":
+            print(store.list_scenarios(args.customer, args.fleet_type, args.limit).to_string(index=False))
+        else:
+            start = time.perf_counter()
+            rows = store.export(args.output, args.customer, args.fleet_type)
+            print(f"Exported {rows:,} scenarios in {time.perf_counter() - start:.2f}s -> {args.output}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import argparse
+import io
+import json
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from model import DEFAULT_FLEET_INPUTS
+
+# Derive the fleet inputs (daily km, downtime percentages, vehicle counts) and
+# their empirical distributions from raw trip and fault logs. Usage:
+#
+#   python telemetry.py --trips trips/*.csv --faults faults/*.csv --output inputs.json
+#
+# Trip logs have vehicle_id, vehicle_class (2W/3W), date and distance_km.
+# Fault logs have vehicle_id, vehicle_class, date, fault_type (battery or
+# software) and downtime_hours. Files are read in blocks and reduced to one
+# row per vehicle per day, so memory depends on the fleet and the number of
+# days, not on the number of log rows. The vehicle-day table and how far each
+# file has been read are saved in a single checkpoint file; re-running after
+# logs were appended or new files added only reads the new data.
+
+TRIP_COLUMNS = ("vehicle_id", "vehicle_class", "date", "distance_km")
+FAULT_COLUMNS = ("vehicle_id", "vehicle_class", "date", "fault_type", "downtime_hours")
+FAULT_TYPES = {"battery": "battery_issues", "software": "software_issues"}
+VEHICLE_CLASSES = {"2W": "2w", "3W": "3w"}
+DAY_KEYS = ["vehicle_id", "vehicle_class", "day"]
+# Read as text, so an id like 007 is the same vehicle whatever the rest of its block holds
+TEXT_COLUMNS = {"vehicle_id": str, "vehicle_class": str}
+DAY_VALUES = ["distance_km", "battery_hours", "software_hours"]
+DEFAULT_CHECKPOINT = ".telemetry.parquet"
+DEFAULT_BLOCK_SIZE = 32 * 1024 * 1024
+
+
+# Function to read the complete lines of a CSV file after a byte offset, block by block.
+# Yields each parsed block with the offset just past its last line.
+def read_csv_blocks(path, offset=0, block_size=DEFAULT_BLOCK_SIZE):
+    with open(path, "rb") as file:
+        columns = pd.read_csv(io.BytesIO(file.readline()), nrows=0).columns
+        offset = max(offset, file.tell())
+        file.seek(offset)
+        remainder = b""
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            block = remainder + block
+            # A trailing line without a newline may still be being written; leave it for the next run
+            end = block.rfind(b"\n") + 1
+            remainder = block[end:]
+            if end:
+                offset += end
+                yield pd.read_csv(io.BytesIO(block[:end]), names=columns, header=None,
+                                  dtype={name: kind for name, kind in TEXT_COLUMNS.items() if name in columns}), offset
+
+
+# Function to read the row groups of a Parquet file from first_group on
+def read_parquet_groups(path, first_group=0):
+    parquet_file = pq.ParquetFile(path)
+    for index in range(first_group, parquet_file.num_row_groups):
+        yield parquet_file.read_row_group(index).to_pandas(), index + 1
+
+
+# Function to reduce a block of trip or fault rows to one row per vehicle per day
+def vehicle_day_totals(frame, kind):
+    columns = TRIP_COLUMNS if kind == "trips" else FAULT_COLUMNS
+    missing = set(columns) - set(frame.columns)
+    if missing:
+        raise ValueError(f"{kind} log is missing column(s): {', '.join(sorted(missing))}")
+    days = pd.DataFrame({
+        "vehicle_id": frame["vehicle_id"].astype(str),
+        "vehicle_class": frame["vehicle_class"].astype(str).str.strip().str.upper(),
+        "day": pd.to_datetime(frame["date"]).dt.normalize(),
+    })
+    for name in DAY_VALUES:
+        days[name] = 0.0
+    if kind == "trips":
+        days["distance_km"] = frame["distance_km"].astype(float)
+    else:
+        fault_type = frame["fault_type"].astype(str).str.strip().str.lower()
+        for name in FAULT_TYPES:
+            days[f"{name}_hours"] = frame["downtime_hours"].astype(float).where(fault_type == name, 0.0)
+    return days.groupby(DAY_KEYS, as_index=False)[DAY_VALUES].sum()
+
+
+class TelemetryAggregate:
+    def __init__(self, checkpoint_path=None):
+        self.checkpoint_path = checkpoint_path
+        self.watermarks = {}
+        self.rows_ingested = 0
+        self._days = pd.DataFrame({
+            "vehicle_id": pd.Series(dtype=str),
+            "vehicle_class": pd.Series(dtype=str),
+            "day": pd.Series(dtype="datetime64[ns]"),
+            **{name: pd.Series(dtype=float) for name in DAY_VALUES},
+        })
+        self._pending = []
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            table = pq.read_table(checkpoint_path)
+            state = json.loads(table.schema.metadata[b"telemetry"])
+            self.watermarks = state["watermarks"]
+            self.rows_ingested = state["rows_ingested"]
+            self._days = table.to_pandas()
+
+    # Vehicle-day table with every partial aggregate merged in
+    @property
+    def days(self):
+        if self._pending:
+            self._days = pd.concat([self._days, *self._pending], ignore_index=True) \
+                .groupby(DAY_KEYS, as_index=False)[DAY_VALUES].sum()
+            self._pending = []
+        return self._days
+
+    # Function to ingest the new part of one trip or fault log
+    def ingest_file(self, path, kind, block_size=DEFAULT_BLOCK_SIZE):
+        key = os.path.abspath(path)
+        watermark = self.watermarks.get(key, {"kind": kind, "position": 0})
+        if path.endswith(".parquet"):
+            blocks = read_parquet_groups(path, watermark["position"])
+        else:
+            if os.path.getsize(path) < watermark["position"]:
+                raise ValueError(f"{path} is shorter than when it was last ingested; start a new checkpoint")
+            blocks = read_csv_blocks(path, watermark["position"], block_size)
+        rows = 0
+        for frame, position in blocks:
+            self._pending.append(vehicle_day_totals(frame, kind))
+            watermark["position"] = position
+            rows += len(frame)
+            if len(self._pending) >= 16:
+                self.days
+        self.watermarks[key] = watermark
+        self.rows_ingested += rows
+        return rows
+
+    def ingest(self, trip_paths=(), fault_paths=(), block_size=DEFAULT_BLOCK_SIZE):
+        rows = 0
+        for kind, paths in (("trips", trip_paths), ("faults", fault_paths)):
+            for path in paths:
+                rows += self.ingest_file(path, kind, block_size)
+        return rows
+
+    # Function to write the vehicle-day table and watermarks to one file, replacing it atomically
+    def save(self):
+        table = pa.Table.from_pandas(self.days, preserve_index=False)
+        state = json.dumps({"watermarks": self.watermarks, "rows_ingested": self.rows_ingested})
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"telemetry": state.encode()})
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        pq.write_table(table, temporary_path)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    # Function to turn the aggregates into model inputs and their empirical distributions
+    def derive_inputs(self, work_hours=DEFAULT_FLEET_INPUTS["work_hours"]):
+        days = self.days
+        inputs = {}
+        distributions = {}
+        for vehicle_class, suffix in VEHICLE_CLASSES.items():
+            class_days = days[days["vehicle_class"] == vehicle_class]
+            # Daily km is averaged over the days a vehicle drove; downtime is accounted for separately
+            driving_days = class_days[class_days["distance_km"] > 0]
+            per_vehicle_km = driving_days.groupby("vehicle_id")["distance_km"].mean()
+            inputs[f"num_vans_{suffix}"] = int(class_days["vehicle_id"].nunique())
+            if len(driving_days):
+                inputs[f"daily_average_km_{suffix}"] = float(driving_days["distance_km"].mean())
+                distributions[f"daily_average_km_{suffix}"] = {"kind": "empirical", "values": per_vehicle_km.round(3).tolist()}
+
+        # Downtime as a percentage of every working day a vehicle was in service
+        if len(days):
+            per_vehicle = days.groupby("vehicle_id").agg(
+                vehicle_days=("day", "size"), battery_hours=("battery_hours", "sum"), software_hours=("software_hours", "sum"))
+            available_hours = per_vehicle["vehicle_days"] * work_hours
+            for name, key in FAULT_TYPES.items():
+                hours = per_vehicle[f"{name}_hours"]
+                inputs[key] = float(min(100.0, hours.sum() / available_hours.sum() * 100))
+                distributions[key] = {"kind": "empirical", "values": (hours / available_hours * 100).clip(upper=100).round(4).tolist()}
+
+        return {
+            "inputs": inputs,
+            "distributions": distributions,
+            "summary": {
+                "rows_ingested": self.rows_ingested,
+                "vehicles": int(days["vehicle_id"].nunique()),
+                "vehicle_days": int(len(days)),
+                "files": len(self.watermarks),
+            },
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Derive fleet model inputs from trip and fault logs.")
+    parser.add_argument("--trips", nargs="*", default=[], help="Trip log CSV/Parquet files")
+    parser.add_argument("--faults", nargs="*", default=[], help="Fault log CSV/Parquet files")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file for incremental runs")
+    parser.add_argument("--work-hours", type=float, default=DEFAULT_FLEET_INPUTS["work_hours"], help="Work hours per day")
+    parser.add_argument("--output", default=None, help="JSON file for the derived inputs (default: stdout)")
+    args = parser.parse_args(argv)
+
+    aggregate = TelemetryAggregate(args.checkpoint)
+    rows = aggregate.ingest(args.trips, args.faults)
+    aggregate.save()
+    print(f"Ingested {rows:,} new rows ({aggregate.rows_ingested:,} in total)", file=sys.stderr)
+
+    derived = json.dumps(aggregate.derive_inputs(args.work_hours), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(derived)
+    else:
+        print(derived)
+
+
+if __name__ == "__main__":
+    main()